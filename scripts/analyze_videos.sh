@@ -17,7 +17,7 @@ if [ ! -f "$VIDEO_LIST" ]; then
 fi
 
 # Count videos in list
-VIDEO_COUNT=$(python3 -c "import json; print(len(json.load(open('$VIDEO_LIST'))['videos']))")
+VIDEO_COUNT=$(uv run python -c "from pathlib import Path; from src.instagram import load_video_list; print(len(load_video_list(Path('$VIDEO_LIST')).videos))")
 echo "Found $VIDEO_COUNT videos in $VIDEO_LIST"
 
 # Build command
@@ -1,21 +1,28 @@
 """Gemini video analyzer with structured output."""
 
+import functools
+import io
 import logging
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import IO
 
+import orjson
 from google import genai
 from google.genai import types
 from pydantic import ValidationError
 from tenacity import (
-    retry,
+    Retrying,
     retry_if_exception_type,
     stop_after_attempt,
     wait_exponential,
 )
 
-from src.models import ExerciseAnalysis, GeneralInsights, VideoResult
+from src.models import ExerciseAnalysis, GeneralInsights, VideoResult, post_url
+from src.ratelimit import TokenBucket
 
 logger = logging.getLogger(__name__)
 
@@ -23,73 +30,176 @@ logger = logging.getLogger(__name__)
 MODEL_NAME = "gemini-2.5-flash-lite"
 
 # Rate limiting for Gemini API
-GEMINI_REQUEST_DELAY_SECONDS = 5.0
+GEMINI_REQUESTS_PER_MINUTE = 12.0
+
+# Retry policies, shared by every call instead of rebuilt by a decorator each time
+_UPLOAD_RETRY = Retrying(
+    retry=retry_if_exception_type(Exception),
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=10, min=10, max=120),
+    before_sleep=lambda retry_state: logger.warning(
+        "Gemini API error, retrying in %ss...", retry_state.next_action.sleep
+    ),
+)
+_GENERATE_RETRY = Retrying(
+    retry=retry_if_exception_type(Exception),
+    stop=stop_after_attempt(5),
+    wait=wait_exponential(multiplier=30, min=30, max=300),
+    before_sleep=lambda retry_state: logger.warning(
+        "Gemini API error, retrying in %ss...", retry_state.next_action.sleep
+    ),
+)
+
+# Backoff while waiting for Gemini to process an uploaded file
+FILE_POLL_INITIAL_SECONDS = 0.25
+FILE_POLL_MAX_SECONDS = 5.0
+FILE_POLL_BACKOFF = 1.5
+
+# Uploaded files are deleted in groups of this size, several at a time. The
+# group stays small so a long run never holds much of the Files API quota.
+DELETE_BATCH_SIZE = 16
+DELETE_WORKERS = 8
+
+# Polling interval while waiting for a batch job to finish
+BATCH_POLL_INTERVAL_SECONDS = 30.0
+
+_BATCH_TERMINAL_STATES = {
+    "JOB_STATE_SUCCEEDED",
+    "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED",
+}
 
 
+@functools.lru_cache(maxsize=1)
 def _load_prompt() -> str:
     """Load the analysis prompt from file."""
     prompt_path = Path(__file__).parent / "prompts" / "analysis.txt"
     return prompt_path.read_text()
 
 
+# Loaded and generated once per process rather than per analyzer or request
+_PROMPT = _load_prompt()
+_EXERCISE_SCHEMA = ExerciseAnalysis.model_json_schema()
+_GENERAL_SCHEMA = GeneralInsights.model_json_schema()
+_EXERCISE_CONFIG = types.GenerateContentConfig(
+    response_mime_type="application/json", response_schema=_EXERCISE_SCHEMA
+)
+_GENERAL_CONFIG = types.GenerateContentConfig(
+    response_mime_type="application/json", response_schema=_GENERAL_SCHEMA
+)
+
+
+def _salvage_general_insights(response_text: str) -> GeneralInsights | None:
+    """Build general insights from a response that failed the exercise schema.
+
+    Returns None when the response carries no trainer insights to keep.
+    """
+    try:
+        data = orjson.loads(response_text)
+    except orjson.JSONDecodeError:
+        return None
+
+    if not isinstance(data, dict):
+        return None
+    trainer_insights = data.get("trainer_insights")
+    if not isinstance(trainer_insights, str) or not trainer_insights.strip():
+        return None
+
+    video_type = data.get("video_type")
+    return GeneralInsights(
+        trainer_insights=trainer_insights,
+        video_type=video_type if isinstance(video_type, str) else "unclassified",
+    )
+
+
 class VideoAnalyzer:
     """Analyzes gym training videos using Gemini AI."""
 
-    def __init__(self, api_key: str) -> None:
+    def __init__(
+        self, api_key: str, requests_per_minute: float = GEMINI_REQUESTS_PER_MINUTE
+    ) -> None:
         """Initialize the analyzer.
 
         Args:
             api_key: Google AI API key.
+            requests_per_minute: Budget for generate_content calls, shared by
+                all threads using this analyzer.
         """
         # Clear conflicting env var so SDK uses the provided key
         os.environ.pop("GOOGLE_API_KEY", None)
         self._client = genai.Client(api_key=api_key)
-        self._prompt = _load_prompt()
-
-    @retry(
-        retry=retry_if_exception_type(Exception),
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=10, min=10, max=120),
-        before_sleep=lambda retry_state: logger.warning(
-            f"Gemini API error, retrying in {retry_state.next_action.sleep}s..."
-        ),
-    )
-    def _upload_video(self, video_path: Path) -> types.File:
+        self._prompt = _PROMPT
+        self._bucket = TokenBucket(requests_per_minute)
+        self._pending_deletes: list[types.File] = []
+        self._deletes_lock = threading.Lock()
+        self._closed = False
+        # Threads are started on the first flush and kept for later ones
+        self._delete_pool = ThreadPoolExecutor(
+            max_workers=DELETE_WORKERS, thread_name_prefix="delete"
+        )
+
+    def _upload_video(self, video: Path | IO[bytes]) -> types.File:
         """Upload video to Gemini and wait for processing."""
-        logger.info(f"Uploading video to Gemini: {video_path}")
-        video_file = self._client.files.upload(file=str(video_path))
+        return _UPLOAD_RETRY(self._upload_video_once, video)
 
-        # Wait for file to be processed
+    def _upload_video_once(self, video: Path | IO[bytes]) -> types.File:
+        """Make a single attempt of _upload_video."""
+        logger.info("Uploading video to Gemini: %s", video)
+        if isinstance(video, Path):
+            video_file = self._client.files.upload(file=str(video))
+        else:
+            # Rewind in case a previous attempt consumed part of the buffer
+            video.seek(0)
+            video_file = self._client.files.upload(
+                file=video, config={"mime_type": "video/mp4"}
+            )
+
+        # Check once right away: short videos are often ready by then
+        if video_file.state.name == "PROCESSING":
+            video_file = self._client.files.get(name=video_file.name)
+
+        # Then poll quickly at first, backing off for longer videos
+        delay = FILE_POLL_INITIAL_SECONDS
         while video_file.state.name == "PROCESSING":
-            logger.debug(f"Waiting for file {video_file.name} to be processed...")
-            time.sleep(5)
+            logger.debug("Waiting for file %s to be processed...", video_file.name)
+            time.sleep(delay)
+            delay = min(delay * FILE_POLL_BACKOFF, FILE_POLL_MAX_SECONDS)
             video_file = self._client.files.get(name=video_file.name)
 
         if video_file.state.name != "ACTIVE":
             raise RuntimeError(f"File processing failed: {video_file.state.name}")
 
-        logger.info(f"Video uploaded and ready: {video_file.name}")
+        logger.info("Video uploaded and ready: %s", video_file.name)
         return video_file
 
-    @retry(
-        retry=retry_if_exception_type(Exception),
-        stop=stop_after_attempt(5),
-        wait=wait_exponential(multiplier=30, min=30, max=300),
-        before_sleep=lambda retry_state: logger.warning(
-            f"Gemini API error, retrying in {retry_state.next_action.sleep}s..."
-        ),
-    )
-    def _analyze_with_schema(self, video_file: types.File, schema: type) -> str:
-        """Run analysis with a specific schema."""
-        time.sleep(GEMINI_REQUEST_DELAY_SECONDS)
+    def upload(self, video: Path | IO[bytes]) -> types.File:
+        """Upload a video for a later analyze_batch call.
+
+        Args:
+            video: Path to the video file, or a binary buffer holding it.
+
+        Returns:
+            The processed Gemini file, ready to be referenced by a request.
+        """
+        return self._upload_video(video)
+
+    def _analyze_with_schema(
+        self, video_file: types.File, config: types.GenerateContentConfig
+    ) -> str:
+        """Run analysis with a prebuilt response schema config."""
+        return _GENERATE_RETRY(self._analyze_with_schema_once, video_file, config)
+
+    def _analyze_with_schema_once(
+        self, video_file: types.File, config: types.GenerateContentConfig
+    ) -> str:
+        """Make a single attempt of _analyze_with_schema."""
+        self._bucket.acquire()
 
         response = self._client.models.generate_content(
             model=MODEL_NAME,
             contents=[video_file, self._prompt],
-            config={
-                "response_mime_type": "application/json",
-                "response_schema": schema,
-            },
+            config=config,
         )
         return response.text
 
@@ -97,59 +207,107 @@ class VideoAnalyzer:
         """Delete uploaded video from Gemini."""
         try:
             self._client.files.delete(name=video_file.name)
-            logger.debug(f"Deleted video from Gemini: {video_file.name}")
+            logger.debug("Deleted video from Gemini: %s", video_file.name)
         except Exception as e:
-            logger.warning(f"Failed to delete video from Gemini: {e}")
+            logger.warning("Failed to delete video from Gemini: %s", e)
+
+    def _schedule_delete(self, video_file: types.File) -> None:
+        """Queue an uploaded video for deletion, flushing once a batch is full.
+
+        Once the analyzer is closed there is no later flush, so the video is
+        deleted right away instead.
+        """
+        with self._deletes_lock:
+            closed = self._closed
+            if not closed:
+                self._pending_deletes.append(video_file)
+                full = len(self._pending_deletes) >= DELETE_BATCH_SIZE
+        if closed:
+            self._delete_video(video_file)
+        elif full:
+            self.flush_deletes()
+
+    def flush_deletes(self) -> None:
+        """Delete all queued uploads from Gemini concurrently."""
+        with self._deletes_lock:
+            pending, self._pending_deletes = self._pending_deletes, []
+        # _delete_video logs failures itself, so this never raises
+        list(self._delete_pool.map(self._delete_video, pending))
+
+    def close(self) -> None:
+        """Delete all queued uploads, and any scheduled from now on.
+
+        Analyses still running when the caller stops waiting for them (e.g.
+        after an interrupt) delete their uploads themselves when they finish.
+        """
+        with self._deletes_lock:
+            self._closed = True
+        self.flush_deletes()
+        self._delete_pool.shutdown()
+
+    def _fallback_to_general(
+        self, video_file: types.File, shortcode: str, response_text: str
+    ) -> VideoResult:
+        """Build general insights, re-running analysis only if needed.
 
-    def analyze(self, video_path: Path, shortcode: str) -> VideoResult:
+        The rejected exercise response is reused when it already holds
+        trainer insights, which saves a second Gemini call.
+        """
+        general_insights = _salvage_general_insights(response_text)
+        if general_insights is None:
+            response_text = self._analyze_with_schema(video_file, _GENERAL_CONFIG)
+            general_insights = GeneralInsights.model_validate_json(response_text)
+
+        return VideoResult(
+            shortcode=shortcode,
+            url=post_url(shortcode),
+            is_exercise_video=False,
+            general_insights=general_insights,
+        )
+
+    def analyze(self, video: Path | IO[bytes], shortcode: str) -> VideoResult:
         """Analyze a video and return structured results.
 
         Args:
-            video_path: Path to the video file.
+            video: Path to the video file, or a binary buffer holding it.
             shortcode: Instagram post shortcode.
 
         Returns:
             VideoResult with analysis or error.
         """
-        url = f"https://www.instagram.com/p/{shortcode}/"
+        url = post_url(shortcode)
         video_file = None
 
         try:
             # Upload video
-            video_file = self._upload_video(video_path)
+            video_file = self._upload_video(video)
 
-            # Try full exercise analysis first
+            # Try full exercise analysis first. API errors are not schema
+            # mismatches, so they skip the fallback and fail the video
+            logger.info("Analyzing video with full schema: %s", shortcode)
+            response_text = self._analyze_with_schema(video_file, _EXERCISE_CONFIG)
             try:
-                logger.info(f"Analyzing video with full schema: {shortcode}")
-                response_text = self._analyze_with_schema(video_file, ExerciseAnalysis)
                 exercise_analysis = ExerciseAnalysis.model_validate_json(response_text)
-
-                return VideoResult(
-                    shortcode=shortcode,
-                    url=url,
-                    is_exercise_video=True,
-                    exercise_analysis=exercise_analysis,
-                )
-
-            except (ValidationError, Exception) as e:
+            except ValidationError as e:
                 logger.info(
-                    f"Video {shortcode} doesn't match exercise schema, "
-                    f"trying general insights: {e}"
+                    "Video %s doesn't match exercise schema, "
+                    "trying general insights: %s",
+                    shortcode,
+                    e,
                 )
 
                 # Fall back to general insights
-                response_text = self._analyze_with_schema(video_file, GeneralInsights)
-                general_insights = GeneralInsights.model_validate_json(response_text)
+                return self._fallback_to_general(video_file, shortcode, response_text)
 
-                return VideoResult(
-                    shortcode=shortcode,
-                    url=url,
-                    is_exercise_video=False,
-                    general_insights=general_insights,
-                )
+            return VideoResult(
+                shortcode=shortcode,
+                url=url,
+                is_exercise_video=True,
+                exercise_analysis=exercise_analysis,
+            )
 
         except Exception as e:
-            logger.error(f"Failed to analyze video {shortcode}: {e}")
+            logger.error("Failed to analyze video %s: %s", shortcode, e)
             return VideoResult(
                 shortcode=shortcode,
                 url=url,
@@ -158,6 +316,174 @@ class VideoAnalyzer:
             )
 
         finally:
-            # Clean up uploaded video
+            # Clean up uploaded video along with others from the same run
             if video_file:
-                self._delete_video(video_file)
+                self._schedule_delete(video_file)
+
+    def _build_batch_request(self, video_file: types.File, shortcode: str) -> dict:
+        """Build one JSONL entry of a batch job input file."""
+        return {
+            "key": shortcode,
+            "request": {
+                "contents": [
+                    {
+                        "parts": [
+                            {
+                                "file_data": {
+                                    "file_uri": video_file.uri,
+                                    "mime_type": video_file.mime_type,
+                                }
+                            },
+                            {"text": self._prompt},
+                        ]
+                    }
+                ],
+                "generation_config": {
+                    "response_mime_type": "application/json",
+                    "response_schema": _EXERCISE_SCHEMA,
+                },
+            },
+        }
+
+    def _submit_batch(self, requests: list[dict]) -> tuple[types.File, types.BatchJob]:
+        """Upload the JSONL input file and create the batch job.
+
+        Returns the uploaded input file along with the job, so the caller can
+        delete it once the job has finished reading it.
+        """
+        return _UPLOAD_RETRY(self._submit_batch_once, requests)
+
+    def _submit_batch_once(
+        self, requests: list[dict]
+    ) -> tuple[types.File, types.BatchJob]:
+        """Make a single attempt of _submit_batch."""
+        payload = b"".join(orjson.dumps(request) + b"\n" for request in requests)
+        input_file = self._client.files.upload(
+            file=io.BytesIO(payload),
+            config={"mime_type": "jsonl"},
+        )
+        try:
+            batch_job = self._client.batches.create(
+                model=MODEL_NAME, src=input_file.name
+            )
+        except BaseException:
+            # A retry uploads the input again, so this copy is not needed
+            self._schedule_delete(input_file)
+            raise
+        logger.info("Submitted batch job %s (%d videos)", batch_job.name, len(requests))
+        return input_file, batch_job
+
+    def _wait_for_batch(self, batch_job: types.BatchJob) -> types.BatchJob:
+        """Poll a batch job until it reaches a terminal state."""
+        while batch_job.state.name not in _BATCH_TERMINAL_STATES:
+            logger.debug("Waiting for batch job %s...", batch_job.name)
+            time.sleep(BATCH_POLL_INTERVAL_SECONDS)
+            batch_job = self._client.batches.get(name=batch_job.name)
+
+        if batch_job.state.name != "JOB_STATE_SUCCEEDED":
+            raise RuntimeError(f"Batch job failed: {batch_job.state.name}")
+
+        return batch_job
+
+    def _read_batch_output(self, batch_job: types.BatchJob) -> dict[str, dict]:
+        """Download the batch output file and index its entries by key."""
+        content = self._client.files.download(file=batch_job.dest.file_name)
+        entries = {}
+        for line in content.splitlines():
+            if line.strip():
+                entry = orjson.loads(line)
+                entries[entry["key"]] = entry
+        return entries
+
+    def _batch_entry_to_result(
+        self, video_file: types.File, shortcode: str, entry: dict | None
+    ) -> VideoResult:
+        """Convert one batch output entry into a VideoResult."""
+        url = post_url(shortcode)
+
+        try:
+            if entry is None:
+                raise RuntimeError("Missing from batch output")
+            if "error" in entry:
+                raise RuntimeError(f"Batch request failed: {entry['error']}")
+
+            response = types.GenerateContentResponse.model_validate(entry["response"])
+            try:
+                exercise_analysis = ExerciseAnalysis.model_validate_json(response.text)
+            except ValidationError as e:
+                logger.info(
+                    "Video %s doesn't match exercise schema, "
+                    "trying general insights: %s",
+                    shortcode,
+                    e,
+                )
+                return self._fallback_to_general(video_file, shortcode, response.text)
+
+            return VideoResult(
+                shortcode=shortcode,
+                url=url,
+                is_exercise_video=True,
+                exercise_analysis=exercise_analysis,
+            )
+
+        except Exception as e:
+            logger.error("Failed to analyze video %s: %s", shortcode, e)
+            return VideoResult(
+                shortcode=shortcode,
+                url=url,
+                is_exercise_video=False,
+                error=str(e),
+            )
+
+    def analyze_batch(
+        self, video_files: list[tuple[types.File, str]]
+    ) -> list[VideoResult]:
+        """Analyze uploaded videos with a single Gemini batch job.
+
+        Batch jobs trade latency for throughput: one job replaces a
+        rate-limited request per video and is billed at a discount.
+
+        Args:
+            video_files: Uploaded files (see upload) paired with shortcodes.
+
+        Returns:
+            One VideoResult per input, in input order.
+        """
+        if not video_files:
+            return []
+
+        input_file = None
+        try:
+            requests = [
+                self._build_batch_request(video_file, shortcode)
+                for video_file, shortcode in video_files
+            ]
+            input_file, batch_job = self._submit_batch(requests)
+            batch_job = self._wait_for_batch(batch_job)
+            entries = self._read_batch_output(batch_job)
+
+            return [
+                self._batch_entry_to_result(
+                    video_file, shortcode, entries.get(shortcode)
+                )
+                for video_file, shortcode in video_files
+            ]
+
+        except Exception as e:
+            logger.error("Batch analysis failed: %s", e)
+            return [
+                VideoResult(
+                    shortcode=shortcode,
+                    url=post_url(shortcode),
+                    is_exercise_video=False,
+                    error=str(e),
+                )
+                for _, shortcode in video_files
+            ]
+
+        finally:
+            if input_file is not None:
+                self._schedule_delete(input_file)
+            for video_file, _ in video_files:
+                self._schedule_delete(video_file)
+            self.flush_deletes()
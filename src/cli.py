@@ -6,12 +6,19 @@ import os
 import sys
 from pathlib import Path
 
+import orjson
 from dotenv import load_dotenv
 
+from src.analyzer import GEMINI_REQUESTS_PER_MINUTE
 from src.instagram import (
+    INSTAGRAM_REQUESTS_PER_MINUTE,
+    POST_CACHE_FILE,
+    SHORTCODE_BATCH_SIZE,
     InstagramCrawler,
+    PostCache,
     VideoList,
     VideoPost,
+    append_video_post,
     load_video_list,
     save_video_list,
 )
@@ -32,6 +39,29 @@ def setup_logging(verbose: bool = False) -> None:
     logging.getLogger("instaloader").setLevel(logging.WARNING)
 
 
+def _positive_int(value: str) -> int:
+    """Parse an argparse count, rejecting values below 1."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: {value!r}") from None
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def _positive_rate(value: str) -> float:
+    """Parse an argparse requests-per-minute rate, rejecting values below 1."""
+    try:
+        rate = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number: {value!r}") from None
+    # Written so that NaN is rejected too
+    if not rate >= 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return rate
+
+
 def cmd_list_videos(args: argparse.Namespace) -> None:
     """List videos from a profile and save to file."""
     logger = logging.getLogger(__name__)
@@ -46,23 +76,23 @@ def cmd_list_videos(args: argparse.Namespace) -> None:
 
     try:
         crawler = InstagramCrawler(
-            username=instagram_username, password=instagram_password
+            username=instagram_username,
+            password=instagram_password,
+            requests_per_minute=args.instagram_rpm,
         )
         video_list = crawler.list_videos(args.profile)
         save_video_list(video_list, output_file)
-        logger.info(f"Saved {len(video_list.videos)} videos to {output_file}")
+        logger.info("Saved %d videos to %s", len(video_list.videos), output_file)
     except KeyboardInterrupt:
         logger.info("Aborted by user")
         sys.exit(130)
     except Exception as e:
-        logger.exception(f"Failed to list videos: {e}")
+        logger.exception("Failed to list videos: %s", e)
         sys.exit(1)
 
 
 def cmd_parse_shortcodes(args: argparse.Namespace) -> None:
     """Parse shortcodes from JSON and fetch video URLs."""
-    import json
-
     logger = logging.getLogger(__name__)
 
     instagram_username = os.getenv("INSTAGRAM_USERNAME")
@@ -73,11 +103,11 @@ def cmd_parse_shortcodes(args: argparse.Namespace) -> None:
 
     shortcodes_file = Path(args.shortcodes)
     if not shortcodes_file.exists():
-        logger.error(f"Shortcodes file not found: {shortcodes_file}")
+        logger.error("Shortcodes file not found: %s", shortcodes_file)
         sys.exit(1)
 
-    shortcodes = json.loads(shortcodes_file.read_text())
-    logger.info(f"Loaded {len(shortcodes)} shortcodes from {shortcodes_file}")
+    shortcodes = orjson.loads(shortcodes_file.read_bytes())
+    logger.info("Loaded %d shortcodes from %s", len(shortcodes), shortcodes_file)
 
     output_file = args.output or Path(f"videos_{shortcodes_file.stem}.json")
 
@@ -86,52 +116,72 @@ def cmd_parse_shortcodes(args: argparse.Namespace) -> None:
     processed_shortcodes: set[str] = set()
     if output_file.exists() and not args.fresh:
         try:
-            existing = load_video_list(output_file)
+            existing = load_video_list(output_file, trusted=True)
             existing_videos = existing.videos
             processed_shortcodes = {v.shortcode for v in existing_videos}
-            logger.info(f"Resuming: {len(processed_shortcodes)} already processed")
+            logger.info("Resuming: %d already processed", len(processed_shortcodes))
         except Exception as e:
-            logger.warning(f"Could not load existing file: {e}")
+            logger.warning("Could not load existing file: %s", e)
+
+    # Posts fetched by earlier runs are reused unless starting fresh
+    post_cache = PostCache(output_file.parent / POST_CACHE_FILE)
+    if args.fresh:
+        post_cache.clear()
 
     try:
         crawler = InstagramCrawler(
-            username=instagram_username, password=instagram_password
+            username=instagram_username,
+            password=instagram_password,
+            requests_per_minute=args.instagram_rpm,
+            post_cache=post_cache,
         )
 
+        # Rewrite once up front (also converts legacy JSON files), then only
+        # append newly found videos
         videos = list(existing_videos)
+        profile = args.profile or "unknown"
+        save_video_list(VideoList(profile=profile, videos=videos), output_file)
         skipped = 0
         errors = 0
 
-        for i, shortcode in enumerate(shortcodes):
-            if shortcode in processed_shortcodes:
-                continue
-
-            logger.info(f"[{i + 1}/{len(shortcodes)}] Fetching {shortcode}...")
-            try:
-                video = crawler.get_post_by_shortcode(shortcode)
-                if video:
-                    videos.append(video)
-                    logger.info(f"  Found video: {shortcode}")
-                else:
-                    skipped += 1
-                    logger.debug(f"  Not a video: {shortcode}")
-
-                # Save progress after each successful fetch
-                video_list = VideoList(profile=args.profile or "unknown", videos=videos)
-                save_video_list(video_list, output_file)
-
-            except Exception as e:
-                errors += 1
-                logger.warning(f"  Error fetching {shortcode}: {e}")
-
-        logger.info(f"Done: {len(videos)} videos, {skipped} skipped, {errors} errors")
-        logger.info(f"Saved to {output_file}")
+        pending = [s for s in shortcodes if s not in processed_shortcodes]
+        with output_file.open("ab") as output:
+            for start in range(0, len(pending), SHORTCODE_BATCH_SIZE):
+                batch = pending[start : start + SHORTCODE_BATCH_SIZE]
+                logger.info(
+                    "[%d/%d] Fetching %d shortcodes...",
+                    start + len(batch),
+                    len(pending),
+                    len(batch),
+                )
+                posts = crawler.get_posts_by_shortcodes(batch)
+
+                for shortcode in batch:
+                    if shortcode not in posts:
+                        errors += 1
+                        logger.warning("  Error fetching %s", shortcode)
+                        continue
+
+                    video = posts[shortcode]
+                    if video:
+                        videos.append(video)
+                        # Save progress after each successful fetch
+                        append_video_post(video, output)
+                        logger.info("  Found video: %s", shortcode)
+                    else:
+                        skipped += 1
+                        logger.debug("  Not a video: %s", shortcode)
+
+        logger.info(
+            "Done: %d videos, %d skipped, %d errors", len(videos), skipped, errors
+        )
+        logger.info("Saved to %s", output_file)
 
     except KeyboardInterrupt:
         logger.info("Aborted by user. Progress saved.")
         sys.exit(130)
     except Exception as e:
-        logger.exception(f"Failed: {e}")
+        logger.exception("Failed: %s", e)
         sys.exit(1)
 
 
@@ -152,12 +202,12 @@ def cmd_analyze(args: argparse.Namespace) -> None:
 
     video_list_file = Path(args.video_list)
     if not video_list_file.exists():
-        logger.error(f"Video list file not found: {video_list_file}")
+        logger.error("Video list file not found: %s", video_list_file)
         sys.exit(1)
 
     try:
         video_list = load_video_list(video_list_file)
-        logger.info(f"Loaded {len(video_list.videos)} videos from {video_list_file}")
+        logger.info("Loaded %d videos from %s", len(video_list.videos), video_list_file)
 
         run_pipeline_from_file(
             video_list=video_list,
@@ -166,12 +216,15 @@ def cmd_analyze(args: argparse.Namespace) -> None:
             instagram_username=instagram_username,
             instagram_password=instagram_password,
             max_videos=args.max_videos,
+            batch=args.batch,
+            concurrency=args.concurrency,
+            gemini_rpm=args.gemini_rpm,
         )
     except KeyboardInterrupt:
         logger.info("Aborted by user")
         sys.exit(130)
     except Exception as e:
-        logger.exception(f"Pipeline failed: {e}")
+        logger.exception("Pipeline failed: %s", e)
         sys.exit(1)
 
 
@@ -226,9 +279,20 @@ def main() -> None:
     parse_parser.add_argument(
         "--fresh",
         action="store_true",
-        help="Start fresh, ignore existing progress",
+        help="Start fresh, ignore existing progress and cached posts",
     )
 
+    for instagram_parser in (list_parser, parse_parser):
+        instagram_parser.add_argument(
+            "--instagram-rpm",
+            type=_positive_rate,
+            default=INSTAGRAM_REQUESTS_PER_MINUTE,
+            help=(
+                "Instagram queries per minute "
+                f"(default: {INSTAGRAM_REQUESTS_PER_MINUTE:g})"
+            ),
+        )
+
     # analyze command
     analyze_parser = subparsers.add_parser(
         "analyze", help="Analyze videos from a saved list"
@@ -247,6 +311,27 @@ def main() -> None:
         type=int,
         help="Maximum number of videos to process",
     )
+    analyze_parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Analyze all videos with a single Gemini batch job (cheaper, slower)",
+    )
+    analyze_parser.add_argument(
+        "-j",
+        "--concurrency",
+        type=_positive_int,
+        default=1,
+        help="Number of videos to process in parallel (default: 1)",
+    )
+    analyze_parser.add_argument(
+        "--gemini-rpm",
+        type=_positive_rate,
+        default=GEMINI_REQUESTS_PER_MINUTE,
+        help=(
+            "Gemini analysis requests per minute "
+            f"(default: {GEMINI_REQUESTS_PER_MINUTE:g})"
+        ),
+    )
 
     args = parser.parse_args()
 
@@ -254,7 +339,7 @@ def main() -> None:
 
     if args.env_file.exists():
         load_dotenv(args.env_file)
-        logging.getLogger(__name__).info(f"Loaded environment from: {args.env_file}")
+        logging.getLogger(__name__).info("Loaded environment from: %s", args.env_file)
 
     if args.command == "list-videos":
         cmd_list_videos(args)
@@ -1,35 +1,104 @@
 """Instagram video crawler with rate limiting and error handling."""
 
-import json
 import logging
+import mmap
+import os
 import random
+import re
+import threading
 import time
-import urllib.request
 from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import IO, BinaryIO
 
 import instaloader
+import orjson
+import requests
 from instaloader.exceptions import (
     ConnectionException,
+    InvalidArgumentException,
     QueryReturnedBadRequestException,
     TooManyRequestsException,
 )
-from pydantic import BaseModel
+from instaloader.nodeiterator import FrozenNodeIterator, NodeIterator
+from pydantic import BaseModel, TypeAdapter
+from requests.adapters import HTTPAdapter
 from tenacity import (
-    retry,
+    Retrying,
     retry_if_exception_type,
     stop_after_attempt,
     wait_exponential,
 )
 
+try:
+    import hyperscan
+
+    HAS_HYPERSCAN = True
+except ImportError:  # optional, installed with the "fast-html" extra
+    HAS_HYPERSCAN = False
+
+from src.models import post_url
+from src.ratelimit import TokenBucket
+
 logger = logging.getLogger(__name__)
 
 # Rate limiting constants - be conservative to avoid bans
 BASE_DELAY_SECONDS = 5.0
 DELAY_JITTER_SECONDS = 3.0
+INSTAGRAM_REQUESTS_PER_MINUTE = 15.0
 RATE_LIMIT_PAUSE_SECONDS = 120
 MAX_RATE_LIMIT_RETRIES = 5
 
+# Retry policies, shared by every call instead of rebuilt by a decorator each time
+_QUERY_RETRY = Retrying(
+    retry=retry_if_exception_type(
+        (ConnectionException, QueryReturnedBadRequestException)
+    ),
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=60, min=60, max=300),
+    before_sleep=lambda retry_state: logger.warning(
+        "Connection error, retrying in %ss...", retry_state.next_action.sleep
+    ),
+)
+_POST_RETRY = Retrying(
+    retry=retry_if_exception_type(
+        (ConnectionException, QueryReturnedBadRequestException)
+    ),
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=60, min=60, max=300),
+)
+_VIDEO_URL_RETRY = Retrying(
+    retry=retry_if_exception_type(Exception),
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=10, min=10, max=120),
+)
+_DOWNLOAD_RETRY = Retrying(
+    retry=retry_if_exception_type(Exception),
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(multiplier=5, min=5, max=60),
+)
+
+# Shortcodes fetched per paced batch in get_posts_by_shortcodes
+SHORTCODE_BATCH_SIZE = 40
+# Threads fetching the posts of one batch concurrently
+SHORTCODE_FETCH_WORKERS = 4
+
+# Fetched posts are cached on disk this long. Kept short because the CDN
+# video URLs they contain are signed and expire.
+POST_CACHE_FILE = ".post_cache.jsonl"
+POST_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Read size when streaming a video download into memory
+DOWNLOAD_CHUNK_BYTES = 1 << 20
+DOWNLOAD_TIMEOUT_SECONDS = 30
+DOWNLOAD_POOL_CONNECTIONS = 8
+DOWNLOAD_POOL_MAXSIZE = 16
+
+# Post and reel links in saved profile pages: /p/<shortcode>/ or /reel/<shortcode>/
+SHORTCODE_LENGTH = 11
+_SHORTCODE_RE = re.compile(rb"/(?:p|reel)/([A-Za-z0-9_-]{11})/")
+
 
 def _sleep_with_jitter(base: float = BASE_DELAY_SECONDS) -> None:
     """Sleep with random jitter to avoid detection patterns."""
@@ -45,6 +114,11 @@ class VideoPost(BaseModel):
     video_url: str
     caption: str | None = None
 
+    @classmethod
+    def trusted(cls, data: dict) -> "VideoPost":
+        """Build from data this tool wrote itself, skipping validation."""
+        return cls.model_construct(**data)
+
 
 class VideoList(BaseModel):
     """List of videos from a profile."""
@@ -53,23 +127,183 @@ class VideoList(BaseModel):
     videos: list[VideoPost]
 
 
-def load_video_list(file_path: Path) -> VideoList:
-    """Load video list from JSON file."""
-    data = json.loads(file_path.read_text())
-    return VideoList.model_validate(data)
+# Saved video lists name the VideoPost fields once in their header; each
+# post line is then just the values, in this order
+VIDEO_POST_KEYS = list(VideoPost.model_fields)
+
+# Validates every post of a file in one pass, straight from JSON bytes, and
+# dumps a whole list of posts in one pass when saving
+_VIDEO_POSTS_ADAPTER = TypeAdapter(list[VideoPost])
+
+
+def load_video_list(file_path: Path, trusted: bool = False) -> VideoList:
+    """Load video list from a JSONL file (or a legacy single JSON document).
+
+    The current JSONL layout is a {"profile": ..., "keys": [...]} header
+    line followed by one JSON array of values per VideoPost, in key order.
+
+    Args:
+        file_path: File to load.
+        trusted: Skip per-video validation. Only use for files this tool
+            wrote itself.
+    """
+    data = file_path.read_bytes()
+    header_line, _, body = data.partition(b"\n")
+
+    try:
+        header = orjson.loads(header_line)
+    except orjson.JSONDecodeError:
+        header = None
+
+    if not isinstance(header, dict) or "keys" not in header:
+        if trusted:
+            legacy = orjson.loads(data)
+            return VideoList(
+                profile=legacy["profile"],
+                videos=[VideoPost.trusted(video) for video in legacy["videos"]],
+            )
+        return VideoList.model_validate_json(data)
+
+    lines = [line for line in body.splitlines() if line.strip()]
+    keys = header["keys"]
+    rows = orjson.loads(b"[" + b",".join(lines) + b"]")
+    posts = [dict(zip(keys, row, strict=True)) for row in rows]
+    if trusted:
+        videos = [VideoPost.trusted(post) for post in posts]
+    else:
+        videos = _VIDEO_POSTS_ADAPTER.validate_python(posts)
+    return VideoList(profile=header["profile"], videos=videos)
 
 
 def save_video_list(video_list: VideoList, file_path: Path) -> None:
-    """Save video list to JSON file."""
-    file_path.write_text(video_list.model_dump_json(indent=2))
-    logger.info(f"Saved {len(video_list.videos)} videos to {file_path}")
+    """Save video list to a JSONL file."""
+    lines = [orjson.dumps({"profile": video_list.profile, "keys": VIDEO_POST_KEYS})]
+    # One serializer pass over the whole list, then one line per post
+    rows = _VIDEO_POSTS_ADAPTER.dump_python(video_list.videos)
+    lines.extend(orjson.dumps([row[key] for key in VIDEO_POST_KEYS]) for row in rows)
+    file_path.write_bytes(b"\n".join(lines) + b"\n")
+    logger.info("Saved %d videos to %s", len(video_list.videos), file_path)
+
+
+def append_video_post(video: VideoPost, output: BinaryIO) -> None:
+    """Append a single video to a JSONL file written by save_video_list.
+
+    The caller keeps the file open in append mode across videos; each record
+    is flushed and synced so it survives a crash right after the call.
+    """
+    row = [getattr(video, key) for key in VIDEO_POST_KEYS]
+    output.write(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE))
+    output.flush()
+    os.fsync(output.fileno())
+
+
+class PostCache:
+    """Disk-backed cache of fetched posts, keyed by shortcode.
+
+    Entries are appended to a JSONL file as they are fetched. Entries older
+    than the TTL are dropped when the file is loaded; each keeps the time it
+    was first fetched, so rewriting the file does not extend its TTL.
+    Non-video posts are cached as None so they are not fetched again either.
+    """
+
+    def __init__(self, path: Path, ttl_seconds: float = POST_CACHE_TTL_SECONDS):
+        """Load the live entries of the cache file, if it exists."""
+        self._path = path
+        self._lock = threading.Lock()
+        # shortcode -> (post, time it was fetched)
+        self._posts: dict[str, tuple[VideoPost | None, float]] = {}
+
+        if not path.exists():
+            return
+        cutoff = time.time() - ttl_seconds
+        stale = False
+        for line in path.read_bytes().splitlines():
+            try:
+                entry = orjson.loads(line)
+                fetched_at = entry["fetched_at"]
+                if fetched_at < cutoff:
+                    stale = True
+                    continue
+                post = entry["post"]
+                self._posts[entry["shortcode"]] = (
+                    VideoPost.trusted(post) if post else None,
+                    fetched_at,
+                )
+            except (orjson.JSONDecodeError, KeyError, TypeError):
+                # A line torn by a crash mid-write, or not a cache entry
+                stale = True
+
+        if stale:
+            self._rewrite()
+
+    def __contains__(self, shortcode: str) -> bool:
+        return shortcode in self._posts
+
+    def __getitem__(self, shortcode: str) -> VideoPost | None:
+        return self._posts[shortcode][0]
+
+    def put(self, shortcode: str, post: VideoPost | None) -> None:
+        """Cache a fetched post, or None for a non-video post."""
+        fetched_at = time.time()
+        line = self._entry(shortcode, post, fetched_at)
+        with self._lock:
+            self._posts[shortcode] = (post, fetched_at)
+            with self._path.open("ab") as f:
+                f.write(line)
+
+    def clear(self) -> None:
+        """Forget every cached post."""
+        with self._lock:
+            self._posts.clear()
+            self._path.unlink(missing_ok=True)
+
+    def _rewrite(self) -> None:
+        """Rewrite the file with only the loaded (live) entries."""
+        self._path.write_bytes(
+            b"".join(
+                self._entry(shortcode, post, fetched_at)
+                for shortcode, (post, fetched_at) in self._posts.items()
+            )
+        )
+
+    @staticmethod
+    def _entry(shortcode: str, post: VideoPost | None, fetched_at: float) -> bytes:
+        return orjson.dumps(
+            {
+                "shortcode": shortcode,
+                "fetched_at": fetched_at,
+                "post": post.model_dump() if post else None,
+            },
+            option=orjson.OPT_APPEND_NEWLINE,
+        )
 
 
 class InstagramCrawler:
     """Crawls Instagram profiles for video posts with rate limiting."""
 
-    def __init__(self, username: str, password: str) -> None:
-        """Initialize the crawler. Tries session first, falls back to login."""
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        requests_per_minute: float = INSTAGRAM_REQUESTS_PER_MINUTE,
+        post_cache: PostCache | None = None,
+    ) -> None:
+        """Initialize the crawler. Tries session first, falls back to login.
+
+        Args:
+            username: Instagram login username.
+            password: Instagram login password.
+            requests_per_minute: Budget for Instagram queries, shared by all
+                threads using this crawler.
+            post_cache: Optional cache consulted before fetching a post by
+                shortcode.
+        """
+        self._bucket = TokenBucket(requests_per_minute)
+        self._post_cache = post_cache
+        # Shared by every batch; threads are started on first use and kept
+        self._fetch_pool = ThreadPoolExecutor(
+            max_workers=SHORTCODE_FETCH_WORKERS, thread_name_prefix="shortcode"
+        )
         self._loader = instaloader.Instaloader(
             download_videos=True,
             download_video_thumbnails=False,
@@ -85,13 +319,23 @@ class InstagramCrawler:
         self._loader.context.sleep = True
         self._loader.context.max_connection_attempts = 3
 
+        # Reuse CDN connections across downloads, including from the
+        # pipeline's download threads
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=DOWNLOAD_POOL_CONNECTIONS,
+            pool_maxsize=DOWNLOAD_POOL_MAXSIZE,
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
         # Try to load existing session first
         if self._try_load_session(username):
-            logger.info(f"Using existing session for {username}")
+            logger.info("Using existing session for %s", username)
         else:
-            logger.info(f"No valid session found, logging in as {username}...")
+            logger.info("No valid session found, logging in as %s...", username)
             self._loader.login(username, password)
-            logger.info(f"Successfully logged in as {username}")
+            logger.info("Successfully logged in as %s", username)
 
     def _try_load_session(self, username: str) -> bool:
         """Try to load session from default locations."""
@@ -111,10 +355,10 @@ class InstagramCrawler:
                     self._loader.load_session_from_file(
                         username=username, filename=str(session_path)
                     )
-                    logger.info(f"Loaded session from {session_path}")
+                    logger.info("Loaded session from %s", session_path)
                     return True
                 except Exception as e:
-                    logger.debug(f"Failed to load session from {session_path}: {e}")
+                    logger.debug("Failed to load session from %s: %s", session_path, e)
 
         # Also try wildcard match for any session
         wildcard_paths = [
@@ -130,41 +374,37 @@ class InstagramCrawler:
                     self._loader.load_session_from_file(
                         username=session_username, filename=match
                     )
-                    logger.info(f"Loaded session from {match}")
+                    logger.info("Loaded session from %s", match)
                     return True
                 except Exception as e:
-                    logger.debug(f"Failed to load session from {match}: {e}")
+                    logger.debug("Failed to load session from %s: %s", match, e)
 
         return False
 
     def _handle_rate_limit(self, attempt: int) -> bool:
         """Handle rate limit with exponential backoff."""
         if attempt >= MAX_RATE_LIMIT_RETRIES:
-            logger.error(f"Max rate limit retries ({MAX_RATE_LIMIT_RETRIES}) exceeded")
+            logger.error("Max rate limit retries (%d) exceeded", MAX_RATE_LIMIT_RETRIES)
             return False
 
         wait_time = RATE_LIMIT_PAUSE_SECONDS * (2**attempt)
         wait_time = min(wait_time, 600)
         logger.warning(
-            f"Rate limited (attempt {attempt + 1}/{MAX_RATE_LIMIT_RETRIES}), "
-            f"waiting {wait_time}s..."
+            "Rate limited (attempt %d/%d), waiting %ss...",
+            attempt + 1,
+            MAX_RATE_LIMIT_RETRIES,
+            wait_time,
         )
         time.sleep(wait_time)
         return True
 
-    @retry(
-        retry=retry_if_exception_type(
-            (ConnectionException, QueryReturnedBadRequestException)
-        ),
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=60, min=60, max=300),
-        before_sleep=lambda retry_state: logger.warning(
-            f"Connection error, retrying in {retry_state.next_action.sleep}s..."
-        ),
-    )
     def _get_profile(self, profile_name: str) -> instaloader.Profile:
         """Get profile with retry logic."""
-        _sleep_with_jitter(2)
+        return _QUERY_RETRY(self._get_profile_once, profile_name)
+
+    def _get_profile_once(self, profile_name: str) -> instaloader.Profile:
+        """Make a single attempt of _get_profile."""
+        self._bucket.acquire()
         return instaloader.Profile.from_username(self._loader.context, profile_name)
 
     def list_videos(self, profile_name: str) -> VideoList:
@@ -172,9 +412,9 @@ class InstagramCrawler:
 
         Returns a VideoList that can be saved to file.
         """
-        logger.info(f"Fetching profile: {profile_name}")
+        logger.info("Fetching profile: %s", profile_name)
         profile = self._get_profile(profile_name)
-        logger.info(f"Profile has {profile.mediacount} posts")
+        logger.info("Profile has %d posts", profile.mediacount)
 
         videos: list[VideoPost] = []
         rate_limit_attempts = 0
@@ -183,7 +423,7 @@ class InstagramCrawler:
 
         while True:
             try:
-                _sleep_with_jitter()
+                self._bucket.acquire()
                 post = next(post_iterator)
                 rate_limit_attempts = 0
 
@@ -192,7 +432,7 @@ class InstagramCrawler:
                 seen_shortcodes.add(post.shortcode)
 
                 if not post.is_video:
-                    logger.debug(f"Skipping non-video: {post.shortcode}")
+                    logger.debug("Skipping non-video: %s", post.shortcode)
                     continue
 
                 try:
@@ -201,14 +441,16 @@ class InstagramCrawler:
                         videos.append(
                             VideoPost(
                                 shortcode=post.shortcode,
-                                url=f"https://www.instagram.com/p/{post.shortcode}/",
+                                url=post_url(post.shortcode),
                                 video_url=video_url,
                                 caption=post.caption,
                             )
                         )
-                        logger.info(f"Found video {len(videos)}: {post.shortcode}")
+                        logger.info("Found video %d: %s", len(videos), post.shortcode)
                 except Exception as e:
-                    logger.error(f"Error getting video URL for {post.shortcode}: {e}")
+                    logger.error(
+                        "Error getting video URL for %s: %s", post.shortcode, e
+                    )
 
             except StopIteration:
                 break
@@ -218,23 +460,32 @@ class InstagramCrawler:
                 QueryReturnedBadRequestException,
                 TooManyRequestsException,
             ) as e:
-                logger.warning(f"Rate limit or connection error: {e}")
+                logger.warning("Rate limit or connection error: %s", e)
                 if not self._handle_rate_limit(rate_limit_attempts):
                     # Save what we have so far
-                    logger.warning(f"Stopping early, collected {len(videos)} videos")
+                    logger.warning("Stopping early, collected %d videos", len(videos))
                     break
                 rate_limit_attempts += 1
-                post_iterator = profile.get_posts()
-                # Skip already seen
-                for _ in range(len(seen_shortcodes)):
-                    try:
-                        next(post_iterator)
-                    except StopIteration:
-                        break
-
-        logger.info(f"Total videos found: {len(videos)}")
+                post_iterator = self._resume_posts(profile, post_iterator.freeze())
+
+        logger.info("Total videos found: %d", len(videos))
         return VideoList(profile=profile_name, videos=videos)
 
+    def _resume_posts(
+        self, profile: instaloader.Profile, frozen: FrozenNodeIterator
+    ) -> NodeIterator[instaloader.Post]:
+        """Continue a profile's post iteration where a failed one stopped.
+
+        Falls back to starting over if the frozen state can't be reused;
+        list_videos skips posts it has already seen.
+        """
+        post_iterator = profile.get_posts()
+        try:
+            post_iterator.thaw(frozen)
+        except InvalidArgumentException as e:
+            logger.warning("Cannot resume post iteration, starting over: %s", e)
+        return post_iterator
+
     def get_video_posts(
         self, profile_name: str, skip_shortcodes: set[str] | None = None
     ) -> Iterator[VideoPost]:
@@ -246,13 +497,12 @@ class InstagramCrawler:
             if video.shortcode not in skip_shortcodes:
                 yield video
 
-    @retry(
-        retry=retry_if_exception_type(Exception),
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=10, min=10, max=120),
-    )
     def _get_video_url(self, post: instaloader.Post) -> str | None:
         """Get video URL from post with retry logic."""
+        return _VIDEO_URL_RETRY(self._get_video_url_once, post)
+
+    def _get_video_url_once(self, post: instaloader.Post) -> str | None:
+        """Make a single attempt of _get_video_url."""
         if post.typename == "GraphSidecar":
             for node in post.get_sidecar_nodes():
                 if node.is_video:
@@ -260,58 +510,191 @@ class InstagramCrawler:
             return None
         return post.video_url
 
-    @retry(
-        retry=retry_if_exception_type(
-            (ConnectionException, QueryReturnedBadRequestException)
-        ),
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=60, min=60, max=300),
-    )
+    def _fetch_video_post(self, shortcode: str) -> VideoPost | None:
+        """Fetch a post by shortcode without pacing or retries."""
+        post = instaloader.Post.from_shortcode(self._loader.context, shortcode)
+        if not post.is_video:
+            logger.debug("Post %s is not a video", shortcode)
+            return None
+
+        video_url = self._get_video_url(post)
+        if not video_url:
+            logger.debug("Could not get video URL for %s", shortcode)
+            return None
+
+        return VideoPost(
+            shortcode=shortcode,
+            url=post_url(shortcode),
+            video_url=video_url,
+            caption=post.caption,
+        )
+
+    def _cache_post(self, shortcode: str, post: VideoPost | None) -> VideoPost | None:
+        """Store a fetched post in the post cache, if there is one."""
+        if self._post_cache is not None:
+            self._post_cache.put(shortcode, post)
+        return post
+
     def get_post_by_shortcode(self, shortcode: str) -> VideoPost | None:
         """Fetch a single post by shortcode and return VideoPost if it's a video."""
-        _sleep_with_jitter(2)
+        if self._post_cache is not None and shortcode in self._post_cache:
+            return self._post_cache[shortcode]
+        return self._cache_post(
+            shortcode, _POST_RETRY(self._get_post_by_shortcode_once, shortcode)
+        )
+
+    def _get_post_by_shortcode_once(self, shortcode: str) -> VideoPost | None:
+        """Make a single attempt of get_post_by_shortcode."""
+        self._bucket.acquire()
         try:
-            post = instaloader.Post.from_shortcode(self._loader.context, shortcode)
-            if not post.is_video:
-                logger.debug(f"Post {shortcode} is not a video")
-                return None
-
-            video_url = self._get_video_url(post)
-            if not video_url:
-                logger.debug(f"Could not get video URL for {shortcode}")
-                return None
-
-            return VideoPost(
-                shortcode=shortcode,
-                url=f"https://www.instagram.com/p/{shortcode}/",
-                video_url=video_url,
-                caption=post.caption,
-            )
+            return self._fetch_video_post(shortcode)
         except Exception as e:
-            logger.warning(f"Failed to fetch post {shortcode}: {e}")
+            logger.warning("Failed to fetch post %s: %s", shortcode, e)
             raise
 
-    @retry(
-        retry=retry_if_exception_type(Exception),
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=5, min=5, max=60),
-    )
-    def download_video(self, video_url: str, output_path: Path) -> Path:
-        """Download video to specified path."""
-        logger.info(f"Downloading video to {output_path}")
+    def get_posts_by_shortcodes(
+        self, shortcodes: list[str]
+    ) -> dict[str, VideoPost | None]:
+        """Fetch several posts, pacing once for the batch instead of per post.
+
+        The posts are fetched by a few threads at once; instaloader's rate
+        controller still throttles the individual queries. A post that fails
+        is retried through get_post_by_shortcode.
+
+        Returns:
+            Mapping of shortcode to VideoPost, or None for non-video posts,
+            in input order. Shortcodes that could not be fetched at all are
+            left out.
+        """
+        cache = self._post_cache
+        cached = {
+            shortcode: cache[shortcode]
+            for shortcode in shortcodes
+            if cache is not None and shortcode in cache
+        }
+        posts: dict[str, VideoPost | None] = {}
+        futures = {}
+
+        if len(cached) < len(shortcodes):
+            self._bucket.acquire()
+            futures = {
+                shortcode: self._fetch_pool.submit(self._fetch_batched_post, shortcode)
+                for shortcode in shortcodes
+                if shortcode not in cached
+            }
+
+        for shortcode in shortcodes:
+            if shortcode in cached:
+                posts[shortcode] = cached[shortcode]
+                continue
+            try:
+                posts[shortcode] = futures[shortcode].result()
+            except Exception as e:
+                logger.warning("Giving up on %s: %s", shortcode, e)
+
+        return posts
+
+    def _fetch_batched_post(self, shortcode: str) -> VideoPost | None:
+        """Fetch one post of a batch, falling back to the retrying path."""
+        try:
+            return self._cache_post(shortcode, self._fetch_video_post(shortcode))
+        except Exception as e:
+            logger.debug("Batched fetch of %s failed, retrying: %s", shortcode, e)
+            return self.get_post_by_shortcode(shortcode)
+
+    def warm_up(self, video_url: str) -> None:
+        """Open a pooled connection to the CDN host serving video_url.
+
+        The TLS handshake then happens before the first download instead of
+        during it. Failures are ignored; the download will simply connect.
+        """
+        try:
+            self._session.head(video_url, timeout=DOWNLOAD_TIMEOUT_SECONDS).close()
+        except requests.RequestException as e:
+            logger.debug("CDN warm-up failed: %s", e)
+
+    def download_video(
+        self, video_url: str, output: Path | IO[bytes]
+    ) -> Path | IO[bytes]:
+        """Download video to a path or a writable binary buffer.
+
+        A buffer is rewound after the download so it can be read right away.
+        """
+        return _DOWNLOAD_RETRY(self._download_video_once, video_url, output)
+
+    def _download_video_once(
+        self, video_url: str, output: Path | IO[bytes]
+    ) -> Path | IO[bytes]:
+        """Make a single attempt of download_video."""
+        logger.info("Downloading video to %s", output)
         _sleep_with_jitter()
-        urllib.request.urlretrieve(video_url, output_path)
-        return output_path
+
+        with self._session.get(
+            video_url, stream=True, timeout=DOWNLOAD_TIMEOUT_SECONDS
+        ) as response:
+            response.raise_for_status()
+            chunks = response.iter_content(DOWNLOAD_CHUNK_BYTES)
+
+            if isinstance(output, Path):
+                with output.open("wb") as f:
+                    for chunk in chunks:
+                        f.write(chunk)
+                return output
+
+            # Start over on retries so a partial download isn't kept
+            output.seek(0)
+            output.truncate()
+            for chunk in chunks:
+                output.write(chunk)
+        output.seek(0)
+        return output
+
+
+def _compile_shortcode_db() -> "hyperscan.Database":
+    """Compile the shortcode pattern into a Hyperscan database."""
+    db = hyperscan.Database()
+    # Hyperscan reports match offsets, not groups; the shortcode sits right
+    # before the trailing slash of each match
+    db.compile(expressions=[rb"/(?:p|reel)/[A-Za-z0-9_-]{11}/"])
+    return db
+
+
+_SHORTCODE_DB = _compile_shortcode_db() if HAS_HYPERSCAN else None
+
+
+def _scan_shortcodes(data: bytes | mmap.mmap) -> list[bytes]:
+    """Find all shortcodes in raw page bytes, in document order."""
+    if _SHORTCODE_DB is None:
+        return _SHORTCODE_RE.findall(data)
+
+    # Hyperscan only scans bytes objects, so a mapped file is copied here
+    if isinstance(data, mmap.mmap):
+        data = data[:]
+    matches: list[bytes] = []
+
+    def on_match(_id: int, _start: int, end: int, _flags: int, _ctx: object) -> None:
+        matches.append(data[end - SHORTCODE_LENGTH - 1 : end - 1])
+
+    _SHORTCODE_DB.scan(data, match_event_handler=on_match)
+    return matches
+
+
+def extract_shortcodes_from_bytes(html: bytes | mmap.mmap) -> list[str]:
+    """Extract unique Instagram post shortcodes from raw page bytes, in order."""
+    # Preserve order, dedupe
+    unique = dict.fromkeys(_scan_shortcodes(html))
+    return [shortcode.decode("ascii") for shortcode in unique]
 
 
 def extract_shortcodes_from_html(html_path: Path) -> list[str]:
     """Extract Instagram post shortcodes from saved HTML page."""
-    import re
-
-    html = html_path.read_text(encoding="utf-8", errors="ignore")
-    pattern = r"/(?:p|reel)/([A-Za-z0-9_-]{11})/"
-    shortcodes = list(
-        dict.fromkeys(re.findall(pattern, html))
-    )  # Preserve order, dedupe
-    logger.info(f"Extracted {len(shortcodes)} unique shortcodes from {html_path}")
+    # Shortcodes are ASCII, so match on the mapped raw bytes and skip
+    # reading and decoding the page into memory
+    with html_path.open("rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            shortcodes: list[str] = []
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as html:
+                shortcodes = extract_shortcodes_from_bytes(html)
+    logger.info("Extracted %d unique shortcodes from %s", len(shortcodes), html_path)
     return shortcodes
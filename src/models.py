@@ -1,6 +1,6 @@
 """Pydantic models for structured video analysis output."""
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
 
 class ExerciseAnalysis(BaseModel):
@@ -34,6 +34,11 @@ class GeneralInsights(BaseModel):
     )
 
 
+def post_url(shortcode: str) -> str:
+    """Build the public Instagram URL for a post shortcode."""
+    return f"https://www.instagram.com/p/{shortcode}/"
+
+
 class VideoResult(BaseModel):
     """Result of analyzing a single video."""
 
@@ -53,11 +58,37 @@ class VideoResult(BaseModel):
     )
 
 
+# Built once at import; serializes and parses results straight to and from
+# JSON bytes without going through Python dicts
+VIDEO_RESULT_ADAPTER = TypeAdapter(VideoResult)
+
+
 class ProgressState(BaseModel):
     """Tracks progress for resumable execution."""
 
     profile: str = Field(description="Instagram profile being analyzed")
-    processed_shortcodes: list[str] = Field(
-        default_factory=list, description="List of already processed post shortcodes"
+    processed_shortcodes: set[str] = Field(
+        default_factory=set, description="Set of already processed post shortcodes"
     )
     results_file: str = Field(description="Path to the output results file")
+
+    @classmethod
+    def trusted(cls, data: object) -> "ProgressState":
+        """Build from a snapshot this tool wrote itself, skipping validation.
+
+        Current snapshots only count the processed shortcodes, which are kept
+        in the progress log. Older ones list them inline; those are loaded
+        without validating each one.
+        """
+        if not (
+            isinstance(data, dict)
+            and isinstance(data.get("profile"), str)
+            and isinstance(data.get("processed_shortcodes", []), list)
+            and isinstance(data.get("results_file"), str)
+        ):
+            raise ValueError("Malformed progress snapshot")
+        return cls.model_construct(
+            profile=data["profile"],
+            processed_shortcodes=set(data.get("processed_shortcodes", [])),
+            results_file=data["results_file"],
+        )
@@ -1,16 +1,39 @@
 """Main pipeline for processing Instagram profiles."""
 
-import json
+import itertools
 import logging
+import os
+import shutil
 import tempfile
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
+from typing import IO, TextIO
 
-from src.analyzer import VideoAnalyzer
+import orjson
+from google.genai import types
+
+from src.analyzer import GEMINI_REQUESTS_PER_MINUTE, VideoAnalyzer
 from src.instagram import InstagramCrawler, VideoList, VideoPost
-from src.models import ProgressState, VideoResult
+from src.models import VIDEO_RESULT_ADAPTER, ProgressState, VideoResult
 
 logger = logging.getLogger(__name__)
 
+# The progress snapshot's count is refreshed this often; the log always
+# holds every processed shortcode
+PROGRESS_SNAPSHOT_INTERVAL = 500
+
+# Videos are held in memory up to this size, then spill to a temp file
+VIDEO_SPOOL_MAX_BYTES = 64 << 20
+# Spill to /dev/shm only while it has at least this much room
+SPOOL_MIN_FREE_BYTES = 512 << 20
+
+# Concurrent CDN downloads, each fetching a video ahead of the analysis workers
+DOWNLOAD_WORKERS = 4
+
+# JSON allows only these ASCII bytes as insignificant whitespace
+_JSON_WHITESPACE = (b" ", b"\t", b"\n", b"\r")
+
 
 def _get_progress_file(profile: str, output_dir: Path) -> Path:
     """Get the progress file path for a profile."""
@@ -22,60 +45,372 @@ def _get_results_file(profile: str, output_dir: Path) -> Path:
     return output_dir / f"results_{profile}.jsonl"
 
 
+def _get_progress_log(profile: str, output_dir: Path) -> Path:
+    """Get the append-only progress log path for a profile."""
+    return output_dir / f".processed_{profile}.txt"
+
+
+def _read_snapshot(progress_file: Path) -> ProgressState | None:
+    """Read the last progress snapshot, or None if it is missing or unusable.
+
+    Snapshots are always written as a JSON object, so a file whose first
+    byte after any leading JSON whitespace is not ``{`` is rejected without
+    reading the rest of it.
+    """
+    if not progress_file.exists():
+        return None
+    try:
+        with progress_file.open("rb") as f:
+            head = f.read(1)
+            while head in _JSON_WHITESPACE:
+                head = f.read(1)
+            if head != b"{":
+                raise ValueError(f"expected a JSON object, got {head!r}")
+            return ProgressState.trusted(orjson.loads(head + f.read()))
+    except Exception as e:
+        logger.warning("Failed to load progress file: %s", e)
+        return None
+
+
 def _load_progress(profile: str, output_dir: Path) -> ProgressState:
-    """Load progress state from file or create new."""
+    """Load progress state from file or create new.
+
+    The snapshot holds the profile, results file and processed count; the
+    processed shortcodes themselves are rebuilt from the progress log.
+    """
     progress_file = _get_progress_file(profile, output_dir)
     results_file = _get_results_file(profile, output_dir)
 
-    if progress_file.exists():
-        try:
-            data = json.loads(progress_file.read_text())
-            state = ProgressState.model_validate(data)
-            logger.info(
-                f"Resuming from previous run. "
-                f"Already processed: {len(state.processed_shortcodes)} videos"
+    state = _read_snapshot(progress_file)
+    if state is None:
+        state = ProgressState(
+            profile=profile,
+            processed_shortcodes=set(),
+            results_file=str(results_file),
+        )
+
+    # Snapshots from before the log kept every shortcode list them inline
+    inline = list(state.processed_shortcodes)
+
+    progress_log = _get_progress_log(profile, output_dir)
+    if progress_log.exists():
+        _read_progress_log(state, progress_log)
+
+    if inline:
+        # Move them to the log, or the next count-only snapshot drops them
+        with progress_log.open("a") as f:
+            f.write("".join(shortcode + "\n" for shortcode in inline))
+        _save_progress(state, progress_file)
+
+    if state.processed_shortcodes:
+        logger.info(
+            "Resuming from previous run. Already processed: %d videos",
+            len(state.processed_shortcodes),
+        )
+    return state
+
+
+def _read_progress_log(state: ProgressState, progress_log: Path) -> None:
+    """Add the shortcodes in a progress log, one per line, to the state.
+
+    A last line without its newline was torn by a crash mid-write. It is cut
+    off the file, so the next append can't extend the partial shortcode.
+    """
+    with progress_log.open("r+b") as f:
+        complete = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                f.truncate(complete)
+                break
+            complete += len(line)
+            if line != b"\n":
+                state.processed_shortcodes.add(line[:-1].decode())
+
+
+def _save_progress(state: ProgressState, progress_file: Path) -> None:
+    """Save a progress snapshot to file.
+
+    Only the processed count is stored, so a snapshot costs the same however
+    long the run. It is written to a temporary file and renamed into place,
+    so a crash mid-write leaves the previous snapshot intact.
+    """
+    tmp_file = progress_file.with_name(progress_file.name + ".tmp")
+    tmp_file.write_bytes(
+        orjson.dumps(
+            {
+                "profile": state.profile,
+                "results_file": state.results_file,
+                "processed_count": len(state.processed_shortcodes),
+            }
+        )
+    )
+    os.replace(tmp_file, progress_file)
+
+
+def _checkpoint(
+    state: ProgressState, progress_file: Path, progress_log: TextIO
+) -> None:
+    """Flush the progress log and save a snapshot counting what it holds."""
+    progress_log.flush()
+    _save_progress(state, progress_file)
+
+
+def _mark_processed(
+    state: ProgressState, shortcodes: list[str], progress_log: TextIO
+) -> None:
+    """Mark shortcodes processed in memory and in the append-only log.
+
+    Only the new shortcodes are written, in a single write; the periodic
+    snapshot just records how many there are.
+    """
+    state.processed_shortcodes.update(shortcodes)
+    progress_log.write("".join(shortcode + "\n" for shortcode in shortcodes))
+
+
+class _ResultsWriter:
+    """Appends results to a JSONL file kept open for the whole run.
+
+    Writes go straight to an O_APPEND descriptor, so there is no userspace
+    buffer to copy into and flush.
+    """
+
+    def __init__(self, results_file: Path) -> None:
+        """Open the results file for appending."""
+        self._fd = os.open(results_file, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def __enter__(self) -> "_ResultsWriter":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def append(self, results: list[VideoResult]) -> None:
+        """Append results as JSON lines with a single write.
+
+        The lines are written before the shortcodes reach the progress log, so
+        a video is never marked processed without its result on disk.
+        """
+        data = memoryview(
+            b"".join(
+                VIDEO_RESULT_ADAPTER.dump_json(result) + b"\n" for result in results
             )
-            return state
-        except Exception as e:
-            logger.warning(f"Failed to load progress file: {e}")
+        )
+        # Regular files take the whole write at once; loop in case one doesn't
+        while data:
+            data = data[os.write(self._fd, data) :]
+
+    def close(self) -> None:
+        """Close the results file. Closing twice is a no-op."""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def load_results(results_file: Path) -> Iterator[VideoResult]:
+    """Read a results file back one VideoResult at a time.
+
+    Lines are parsed as they are read, so memory stays flat however many
+    results the file holds.
+    """
+    with results_file.open("rb") as f:
+        for line in f:
+            if line.strip():
+                yield VIDEO_RESULT_ADAPTER.validate_json(line)
+
+
+def _spool_dir() -> str | None:
+    """Pick the directory for videos too large to keep in memory.
 
-    return ProgressState(
-        profile=profile,
-        processed_shortcodes=[],
-        results_file=str(results_file),
+    PIPELINE_TMPDIR wins; otherwise RAM-backed /dev/shm is used when it has
+    room for a spilled video, falling back to the system temp directory.
+    """
+    configured = os.environ.get("PIPELINE_TMPDIR")
+    if configured:
+        return configured
+    shm = Path("/dev/shm")
+    if shm.is_dir() and shutil.disk_usage(shm).free >= SPOOL_MIN_FREE_BYTES:
+        return str(shm)
+    return None
+
+
+def _new_video_buffer() -> IO[bytes]:
+    """Create a buffer for one video, in memory unless the video is large."""
+    return tempfile.SpooledTemporaryFile(
+        max_size=VIDEO_SPOOL_MAX_BYTES, suffix=".mp4", dir=_spool_dir()
     )
 
 
-def _save_progress(state: ProgressState, output_dir: Path) -> None:
-    """Save progress state to file."""
-    progress_file = _get_progress_file(state.profile, output_dir)
-    progress_file.write_text(state.model_dump_json(indent=2))
+def _download_post(post: VideoPost, crawler: InstagramCrawler) -> IO[bytes]:
+    """Download a video post into a spooled buffer."""
+    logger.info("Downloading video: %s", post.shortcode)
+    buffer = _new_video_buffer()
+    try:
+        crawler.download_video(post.video_url, buffer)
+    except BaseException:
+        buffer.close()
+        raise
+    return buffer
 
 
-def _append_result(result: VideoResult, results_file: Path) -> None:
-    """Append a result to the JSONL output file."""
-    with results_file.open("a") as f:
-        f.write(result.model_dump_json() + "\n")
+def _analyze_download(
+    post: VideoPost,
+    download: Future[IO[bytes]],
+    analyzer: VideoAnalyzer,
+) -> VideoResult:
+    """Wait for a prefetched download, then analyze it."""
+    with download.result() as buffer:
+        logger.info("Processing video: %s", post.shortcode)
+        return analyzer.analyze(buffer, post.shortcode)
 
 
-def _process_video(
+def _upload_post(
     post: VideoPost,
     crawler: InstagramCrawler,
     analyzer: VideoAnalyzer,
-) -> VideoResult:
-    """Process a single video post."""
-    with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp:
-        video_path = Path(tmp.name)
+) -> types.File:
+    """Download a video post and upload it to Gemini for batch analysis."""
+    with _new_video_buffer() as buffer:
+        logger.info("Uploading video: %s", post.shortcode)
+        crawler.download_video(post.video_url, buffer)
+        return analyzer.upload(buffer)
+
+
+def _connect_crawler(
+    username: str,
+    password: str,
+    first_video_url: str | None,
+) -> InstagramCrawler:
+    """Log in to Instagram and warm the CDN connection for the first video."""
+    crawler = InstagramCrawler(username=username, password=password)
+    if first_video_url:
+        crawler.warm_up(first_video_url)
+    return crawler
+
+
+def _process_batch(
+    posts: list[VideoPost],
+    crawler: InstagramCrawler,
+    analyzer: VideoAnalyzer,
+) -> list[tuple[VideoPost, VideoResult]]:
+    """Upload all posts, then analyze them with a single batch job."""
+    uploaded: list[tuple[VideoPost, types.File]] = []
+    failed: list[tuple[VideoPost, VideoResult]] = []
+
+    for post in posts:
+        try:
+            uploaded.append((post, _upload_post(post, crawler, analyzer)))
+        except Exception as e:
+            logger.error("Failed to upload %s: %s", post.shortcode, e)
+            failed.append(
+                (
+                    post,
+                    VideoResult(
+                        shortcode=post.shortcode,
+                        url=post.url,
+                        is_exercise_video=False,
+                        error=str(e),
+                    ),
+                )
+            )
+
+    results = analyzer.analyze_batch(
+        [(video_file, post.shortcode) for post, video_file in uploaded]
+    )
+    analyzed = list(zip([post for post, _ in uploaded], results, strict=True))
+    return analyzed + failed
+
+
+def _process_videos(
+    posts: list[VideoPost],
+    crawler: InstagramCrawler,
+    analyzer: VideoAnalyzer,
+    concurrency: int,
+) -> Iterator[list[tuple[VideoPost, VideoResult]]]:
+    """Download and analyze posts in overlapping stages, yielding as they finish.
+
+    A download pool fetches videos into memory ahead of the analysis workers.
+    Only one video per analysis worker plus one per download worker is in
+    flight at once, which bounds memory use. Videos finishing together are
+    yielded together, so they can be persisted with one write.
+    """
+    downloads = ThreadPoolExecutor(
+        max_workers=DOWNLOAD_WORKERS, thread_name_prefix="download"
+    )
+    analyses = ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix="pipeline"
+    )
+    pending = iter(posts)
+    in_flight: dict[Future[VideoResult], VideoPost] = {}
+
+    def submit_next() -> None:
+        post = next(pending, None)
+        if post is None:
+            return
+        download = downloads.submit(_download_post, post, crawler)
+        future = analyses.submit(_analyze_download, post, download, analyzer)
+        in_flight[future] = post
 
     try:
-        logger.info(f"Processing video: {post.shortcode}")
-        crawler.download_video(post.video_url, video_path)
-        result = analyzer.analyze(video_path, post.shortcode)
-        return result
+        for _ in range(concurrency + DOWNLOAD_WORKERS):
+            submit_next()
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            finished = []
+            for future in done:
+                post = in_flight.pop(future)
+                submit_next()
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error("Failed to process %s: %s", post.shortcode, e)
+                    result = VideoResult(
+                        shortcode=post.shortcode,
+                        url=post.url,
+                        is_exercise_video=False,
+                        error=str(e),
+                    )
+                finished.append((post, result))
+            yield finished
     finally:
-        if video_path.exists():
-            video_path.unlink()
-            logger.debug(f"Cleaned up video file: {video_path}")
+        # Don't start queued videos after an interrupt, and don't wait for
+        # running analyses, which can spend minutes in retries. They delete
+        # their uploads themselves once the analyzer is closed.
+        downloads.shutdown(wait=False, cancel_futures=True)
+        analyses.shutdown(wait=False, cancel_futures=True)
+
+
+def _record_results(
+    finished: list[tuple[VideoPost, VideoResult]],
+    state: ProgressState,
+    results_writer: _ResultsWriter,
+    progress_log: TextIO,
+    progress_file: Path,
+) -> int:
+    """Persist the successful results of a group. Returns how many there were."""
+    succeeded = []
+    for post, result in finished:
+        # Only mark as processed if no error (so failed videos can be retried)
+        if result.error:
+            logger.warning("Video %s had error: %s", post.shortcode, result.error)
+            logger.info("Video %s NOT marked as processed (will retry)", post.shortcode)
+        elif result.is_exercise_video:
+            logger.info("Analyzed exercise video: %s", post.shortcode)
+            succeeded.append((post, result))
+        else:
+            logger.info("Processed non-exercise video: %s", post.shortcode)
+            succeeded.append((post, result))
+
+    if not succeeded:
+        return 0
+
+    snapshots_before = len(state.processed_shortcodes) // PROGRESS_SNAPSHOT_INTERVAL
+    results_writer.append([result for _, result in succeeded])
+    _mark_processed(state, [post.shortcode for post, _ in succeeded], progress_log)
+    snapshots_after = len(state.processed_shortcodes) // PROGRESS_SNAPSHOT_INTERVAL
+    if snapshots_after > snapshots_before:
+        _checkpoint(state, progress_file, progress_log)
+    return len(succeeded)
 
 
 def run_pipeline_from_file(
@@ -85,6 +420,9 @@ def run_pipeline_from_file(
     instagram_username: str,
     instagram_password: str,
     max_videos: int | None = None,
+    batch: bool = False,
+    concurrency: int = 1,
+    gemini_rpm: float = GEMINI_REQUESTS_PER_MINUTE,
 ) -> None:
     """Run the analysis pipeline from a pre-fetched video list.
 
@@ -95,71 +433,78 @@ def run_pipeline_from_file(
         instagram_username: Instagram login username.
         instagram_password: Instagram login password.
         max_videos: Optional limit on number of videos to process.
+        batch: Analyze all videos with a single Gemini batch job instead of
+            one request per video.
+        concurrency: Number of videos analyzed in parallel. Each video spends
+            most of its time waiting on Gemini file processing, so these waits
+            overlap well. Downloads run ahead of the analysis workers.
+        gemini_rpm: Gemini analysis requests allowed per minute.
     """
     output_dir.mkdir(parents=True, exist_ok=True)
 
     profile = video_list.profile
     state = _load_progress(profile, output_dir)
+    progress_file = _get_progress_file(profile, output_dir)
     results_file = Path(state.results_file)
-    skip_shortcodes = set(state.processed_shortcodes)
-
-    # Initialize components
-    crawler = InstagramCrawler(username=instagram_username, password=instagram_password)
-    analyzer = VideoAnalyzer(api_key=api_key)
+    skip_shortcodes = state.processed_shortcodes
 
-    # Filter videos to process
-    videos_to_process = [
-        v for v in video_list.videos if v.shortcode not in skip_shortcodes
-    ]
+    # Filter videos to process, stopping as soon as max_videos are found
+    videos_to_process = list(
+        itertools.islice(
+            (v for v in video_list.videos if v.shortcode not in skip_shortcodes),
+            max_videos or None,
+        )
+    )
 
-    if max_videos:
-        videos_to_process = videos_to_process[:max_videos]
+    # Initialize components, logging in to Instagram while Gemini is set up
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="connect") as executor:
+        connecting = executor.submit(
+            _connect_crawler,
+            instagram_username,
+            instagram_password,
+            videos_to_process[0].video_url if videos_to_process else None,
+        )
+        analyzer = VideoAnalyzer(api_key=api_key, requests_per_minute=gemini_rpm)
+        crawler = connecting.result()
 
     logger.info(
-        f"Processing {len(videos_to_process)} videos "
-        f"(skipping {len(skip_shortcodes)} already processed)"
+        "Processing %d videos (skipping %d already processed)",
+        len(videos_to_process),
+        len(skip_shortcodes),
     )
 
     processed_count = 0
     error_count = 0
 
+    results_writer = _ResultsWriter(results_file)
+    progress_log = _get_progress_log(profile, output_dir).open("a", buffering=1)
     try:
-        for post in videos_to_process:
-            try:
-                result = _process_video(post, crawler, analyzer)
-
-                # Only mark as processed if no error (so failed videos can be retried)
-                if result.error:
-                    error_count += 1
-                    logger.warning(f"Video {post.shortcode} had error: {result.error}")
-                    logger.info(
-                        f"Video {post.shortcode} NOT marked as processed (will retry)"
-                    )
-                else:
-                    _append_result(result, results_file)
-                    state.processed_shortcodes.append(post.shortcode)
-                    _save_progress(state, output_dir)
-                    processed_count += 1
-
-                    if result.is_exercise_video:
-                        logger.info(f"Analyzed exercise video: {post.shortcode}")
-                    else:
-                        logger.info(f"Processed non-exercise video: {post.shortcode}")
-
-            except Exception as e:
-                logger.error(f"Failed to process {post.shortcode}: {e}")
-                error_count += 1
-                # Don't mark as processed - will retry next run
-                logger.info(
-                    f"Video {post.shortcode} NOT marked as processed (will retry)"
-                )
+        if batch:
+            groups = iter([_process_batch(videos_to_process, crawler, analyzer)])
+        else:
+            groups = _process_videos(videos_to_process, crawler, analyzer, concurrency)
+
+        # Results are written here, on the main thread, while the workers
+        # keep downloading and analyzing the next videos
+        for finished in groups:
+            succeeded = _record_results(
+                finished, state, results_writer, progress_log, progress_file
+            )
+            processed_count += succeeded
+            error_count += len(finished) - succeeded
 
     except KeyboardInterrupt:
         logger.info("Interrupted by user. Progress saved.")
         raise
 
     finally:
+        results_writer.close()
+        _checkpoint(state, progress_file, progress_log)
+        progress_log.close()
+        analyzer.close()
         logger.info(
-            f"Pipeline complete. Processed: {processed_count}, Errors: {error_count}"
+            "Pipeline complete. Processed: %d, Errors: %d",
+            processed_count,
+            error_count,
         )
-        logger.info(f"Results saved to: {results_file}")
+        logger.info("Results saved to: %s", results_file)
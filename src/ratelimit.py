@@ -0,0 +1,48 @@
+"""Thread-safe request pacing for rate-limited services."""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """Token bucket limiting calls to a requests-per-minute budget.
+
+    Tokens refill continuously at ``requests_per_minute / 60`` per second, up
+    to ``burst``. Each caller reserves a token under the lock and then sleeps
+    outside it until that token is due, so concurrent callers are spaced
+    evenly instead of waking together.
+    """
+
+    def __init__(self, requests_per_minute: float, burst: int = 1) -> None:
+        """Initialize the bucket.
+
+        Args:
+            requests_per_minute: Sustained request rate.
+            burst: Number of requests that may be made back to back after an
+                idle period.
+        """
+        if requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be positive")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+
+        self._rate = requests_per_minute / 60.0
+        self._burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until the caller may make one request."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._burst, self._tokens + (now - self._updated) * self._rate
+            )
+            self._updated = now
+            # Tokens may go negative: that debt is the queue of waiting callers
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
@@ -1,6 +1,9 @@
 """Tests for Gemini video analyzer."""
 
+import io
+import json
 import tempfile
+import threading
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
@@ -19,6 +22,15 @@ class TestLoadPrompt:
         assert isinstance(prompt, str)
         assert len(prompt) > 0
 
+    def test_load_prompt_reads_file_once(self) -> None:
+        """Test that repeated loads reuse the cached prompt."""
+        with patch("src.analyzer.Path.read_text") as mock_read:
+            first = _load_prompt()
+            second = _load_prompt()
+
+        mock_read.assert_not_called()
+        assert first is second
+
 
 class TestVideoAnalyzer:
     """Tests for VideoAnalyzer class."""
@@ -120,9 +132,81 @@ class TestVideoAnalyzer:
             assert result.is_exercise_video is False
             assert result.general_insights is not None
             assert result.general_insights.video_type == "motivational content"
+
+            # Both calls reuse the schemas generated at import time
+            schemas = [
+                call.kwargs["config"].response_schema
+                for call in mock_client.models.generate_content.call_args_list
+            ]
+            assert schemas == [
+                ExerciseAnalysis.model_json_schema(),
+                GeneralInsights.model_json_schema(),
+            ]
         finally:
             video_path.unlink()
 
+    @patch("src.analyzer.genai.Client")
+    def test_analyze_reuses_partial_response(
+        self, mock_client_class: MagicMock
+    ) -> None:
+        """Test a rejected response with trainer insights skips the second call."""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+
+        mock_file = MagicMock()
+        mock_file.state.name = "ACTIVE"
+        mock_file.name = "test-file"
+        mock_client.files.upload.return_value = mock_file
+
+        partial_response = MagicMock()
+        partial_response.text = json.dumps(
+            {"trainer_insights": "Sleep at least 8 hours", "machine": "none"}
+        )
+        mock_client.models.generate_content.return_value = partial_response
+
+        analyzer = VideoAnalyzer(api_key="test-key")
+
+        with patch("src.analyzer.time.sleep"):
+            result = analyzer.analyze(io.BytesIO(b"video"), "PARTIAL1")
+
+        assert mock_client.models.generate_content.call_count == 1
+        assert result.is_exercise_video is False
+        assert result.general_insights is not None
+        assert result.general_insights.trainer_insights == "Sleep at least 8 hours"
+        assert result.general_insights.video_type == "unclassified"
+
+    @patch("src.analyzer.genai.Client")
+    def test_analyze_api_error_skips_general_fallback(
+        self, mock_client_class: MagicMock
+    ) -> None:
+        """Test API errors fail the video instead of trying the general schema."""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+
+        mock_file = MagicMock()
+        mock_file.state.name = "ACTIVE"
+        mock_file.name = "test-file"
+        mock_client.files.upload.return_value = mock_file
+        mock_client.models.generate_content.side_effect = RuntimeError("quota")
+
+        analyzer = VideoAnalyzer(api_key="test-key")
+
+        with patch("src.analyzer.time.sleep"):
+            result = analyzer.analyze(io.BytesIO(b"video"), "QUOTA1")
+
+        assert result.error is not None
+        assert result.general_insights is None
+        # Every call was a retry of the exercise schema
+        schemas = {
+            id(call.kwargs["config"].response_schema)
+            for call in mock_client.models.generate_content.call_args_list
+        }
+        assert len(schemas) == 1
+        # The upload is deleted with the next batch of deletes
+        mock_client.files.delete.assert_not_called()
+        analyzer.flush_deletes()
+        mock_client.files.delete.assert_called_once_with(name="test-file")
+
     @patch("src.analyzer.genai.Client")
     def test_analyze_video_error_handling(self, mock_client_class: MagicMock) -> None:
         """Test error handling during video analysis."""
@@ -180,6 +264,78 @@ class TestVideoAnalyzer:
         # Should not raise
         analyzer._delete_video(mock_file)
 
+    @patch("src.analyzer.genai.Client")
+    def test_deletes_flushed_in_batches(self, mock_client_class: MagicMock) -> None:
+        """Test queued deletes are sent once a batch fills up or on flush."""
+        from src.analyzer import DELETE_BATCH_SIZE
+
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+
+        analyzer = VideoAnalyzer(api_key="test-key")
+        files = []
+        for i in range(DELETE_BATCH_SIZE + 1):
+            mock_file = MagicMock()
+            mock_file.name = f"files/{i}"
+            files.append(mock_file)
+
+        for mock_file in files[:-1]:
+            analyzer._schedule_delete(mock_file)
+        assert mock_client.files.delete.call_count == DELETE_BATCH_SIZE
+
+        analyzer._schedule_delete(files[-1])
+        assert mock_client.files.delete.call_count == DELETE_BATCH_SIZE
+        analyzer.flush_deletes()
+        analyzer.flush_deletes()
+
+        deleted = {c.kwargs["name"] for c in mock_client.files.delete.call_args_list}
+        assert deleted == {f.name for f in files}
+
+    @patch("src.analyzer.genai.Client")
+    def test_flush_deletes_reuses_threads(self, mock_client_class: MagicMock) -> None:
+        """Test every flush runs on the analyzer's long-lived delete pool."""
+        from src.analyzer import DELETE_WORKERS
+
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+        threads = set()
+        mock_client.files.delete.side_effect = lambda **_: threads.add(
+            threading.current_thread()
+        )
+
+        analyzer = VideoAnalyzer(api_key="test-key")
+        for i in range(3 * DELETE_WORKERS):
+            mock_file = MagicMock()
+            mock_file.name = f"files/{i}"
+            analyzer._schedule_delete(mock_file)
+            analyzer.flush_deletes()
+
+        assert mock_client.files.delete.call_count == 3 * DELETE_WORKERS
+        # A pool per flush would have started a new thread every time
+        assert len(threads) <= DELETE_WORKERS
+
+    @patch("src.analyzer.genai.Client")
+    def test_deletes_after_close_run_right_away(
+        self, mock_client_class: MagicMock
+    ) -> None:
+        """Test uploads scheduled for deletion after the final flush are deleted."""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+
+        analyzer = VideoAnalyzer(api_key="test-key")
+        queued = MagicMock()
+        queued.name = "files/queued"
+        analyzer._schedule_delete(queued)
+        analyzer.close()
+        mock_client.files.delete.assert_called_once_with(name="files/queued")
+
+        # An analysis still running at close finishes afterwards
+        late = MagicMock()
+        late.name = "files/late"
+        analyzer._schedule_delete(late)
+        mock_client.files.delete.assert_called_with(name="files/late")
+        assert mock_client.files.delete.call_count == 2
+
     @patch("src.analyzer.genai.Client")
     def test_upload_video_waits_for_processing(
         self, mock_client_class: MagicMock
@@ -215,6 +371,77 @@ class TestVideoAnalyzer:
         finally:
             video_path.unlink()
 
+    @patch("src.analyzer.genai.Client")
+    def test_upload_video_from_buffer(self, mock_client_class: MagicMock) -> None:
+        """Test uploading an in-memory video rewinds it and sets the mime type."""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+
+        active_file = MagicMock()
+        active_file.state.name = "ACTIVE"
+        mock_client.files.upload.return_value = active_file
+
+        buffer = io.BytesIO(b"fake video content")
+        buffer.seek(5)
+
+        analyzer = VideoAnalyzer(api_key="test-key")
+        analyzer._upload_video(buffer)
+
+        mock_client.files.upload.assert_called_once_with(
+            file=buffer, config={"mime_type": "video/mp4"}
+        )
+        assert buffer.tell() == 0
+
+    @patch("src.analyzer.genai.Client")
+    def test_upload_video_poll_backoff(self, mock_client_class: MagicMock) -> None:
+        """Test that polling starts short and backs off up to the cap."""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+
+        processing_file = MagicMock()
+        processing_file.state.name = "PROCESSING"
+        active_file = MagicMock()
+        active_file.state.name = "ACTIVE"
+
+        mock_client.files.upload.return_value = processing_file
+        mock_client.files.get.side_effect = [processing_file] * 9 + [active_file]
+
+        analyzer = VideoAnalyzer(api_key="test-key")
+
+        with patch("src.analyzer.time.sleep") as mock_sleep:
+            analyzer._upload_video(Path("/tmp/video.mp4"))
+
+        delays = [c.args[0] for c in mock_sleep.call_args_list]
+        assert delays[:3] == [0.25, 0.375, 0.5625]
+        assert max(delays) == 5.0
+        # The first poll happens right after the upload, without sleeping
+        assert len(delays) == 9
+
+    @patch("src.analyzer.genai.Client")
+    def test_upload_video_ready_on_first_poll(
+        self, mock_client_class: MagicMock
+    ) -> None:
+        """Test that a file ready on the first poll is used without sleeping."""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+
+        processing_file = MagicMock()
+        processing_file.state.name = "PROCESSING"
+        active_file = MagicMock()
+        active_file.state.name = "ACTIVE"
+
+        mock_client.files.upload.return_value = processing_file
+        mock_client.files.get.return_value = active_file
+
+        analyzer = VideoAnalyzer(api_key="test-key")
+
+        with patch("src.analyzer.time.sleep") as mock_sleep:
+            result = analyzer._upload_video(Path("/tmp/video.mp4"))
+
+        assert result is active_file
+        mock_client.files.get.assert_called_once()
+        mock_sleep.assert_not_called()
+
     @patch("src.analyzer.genai.Client")
     def test_upload_video_fails_on_bad_state(
         self, mock_client_class: MagicMock
@@ -281,3 +508,149 @@ class TestVideoAnalyzer:
             assert result.url == "https://www.instagram.com/p/SHORTCODE1/"
         finally:
             video_path.unlink()
+
+
+class TestAnalyzeBatch:
+    """Tests for batch analysis."""
+
+    @staticmethod
+    def _batch_line(key: str, text: str) -> str:
+        response = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+        return json.dumps({"key": key, "response": response})
+
+    @staticmethod
+    def _uploaded_file(name: str) -> MagicMock:
+        video_file = MagicMock()
+        video_file.name = name
+        video_file.uri = f"https://generativelanguage.googleapis.com/v1beta/{name}"
+        video_file.mime_type = "video/mp4"
+        return video_file
+
+    @patch("src.analyzer.genai.Client")
+    def test_analyze_batch_success(self, mock_client_class: MagicMock) -> None:
+        """Test batch job results are mapped back to shortcodes."""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+
+        running_job = MagicMock()
+        running_job.name = "batches/1"
+        running_job.state.name = "JOB_STATE_RUNNING"
+        done_job = MagicMock()
+        done_job.name = "batches/1"
+        done_job.state.name = "JOB_STATE_SUCCEEDED"
+        done_job.dest.file_name = "files/output"
+        mock_client.batches.create.return_value = running_job
+        mock_client.batches.get.return_value = done_job
+
+        exercise_json = ExerciseAnalysis(
+            muscle_group="chest",
+            machine="bench",
+            wrong_way="Bounce",
+            correct_way="Pause",
+            trainer_insights="Control",
+        ).model_dump_json()
+        mock_client.files.download.return_value = "\n".join(
+            [
+                self._batch_line("B", exercise_json),
+                json.dumps({"key": "A", "error": {"message": "quota"}}),
+            ]
+        ).encode()
+
+        file_a = self._uploaded_file("files/a")
+        file_b = self._uploaded_file("files/b")
+
+        analyzer = VideoAnalyzer(api_key="test-key")
+        with patch("src.analyzer.time.sleep"):
+            results = analyzer.analyze_batch([(file_a, "A"), (file_b, "B")])
+
+        assert [r.shortcode for r in results] == ["A", "B"]
+        assert results[0].error is not None
+        assert results[1].is_exercise_video is True
+        assert results[1].exercise_analysis.machine == "bench"
+        mock_client.batches.create.assert_called_once()
+        # Both videos and the batch input file are cleaned up
+        assert mock_client.files.delete.call_count == 3
+
+    @patch("src.analyzer.genai.Client")
+    def test_analyze_batch_falls_back_to_general(
+        self, mock_client_class: MagicMock
+    ) -> None:
+        """Test entries failing the exercise schema are re-run as general."""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+
+        done_job = MagicMock()
+        done_job.state.name = "JOB_STATE_SUCCEEDED"
+        mock_client.batches.create.return_value = done_job
+        mock_client.files.download.return_value = self._batch_line(
+            "GEN1", '{"invalid": "data"}'
+        ).encode()
+
+        general_response = MagicMock()
+        general_response.text = GeneralInsights(
+            trainer_insights="Sleep more",
+            video_type="recovery advice",
+        ).model_dump_json()
+        mock_client.models.generate_content.return_value = general_response
+
+        analyzer = VideoAnalyzer(api_key="test-key")
+        with patch("src.analyzer.time.sleep"):
+            results = analyzer.analyze_batch([(self._uploaded_file("files/g"), "GEN1")])
+
+        assert results[0].is_exercise_video is False
+        assert results[0].general_insights.video_type == "recovery advice"
+
+    @patch("src.analyzer.genai.Client")
+    def test_analyze_batch_job_failure(self, mock_client_class: MagicMock) -> None:
+        """Test a failed batch job marks every video as errored."""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+
+        failed_job = MagicMock()
+        failed_job.state.name = "JOB_STATE_FAILED"
+        mock_client.batches.create.return_value = failed_job
+
+        analyzer = VideoAnalyzer(api_key="test-key")
+        results = analyzer.analyze_batch(
+            [
+                (self._uploaded_file("files/x"), "X"),
+                (self._uploaded_file("files/y"), "Y"),
+            ]
+        )
+
+        assert all(r.error and "JOB_STATE_FAILED" in r.error for r in results)
+        assert mock_client.files.delete.call_count == 3
+
+    @patch("src.analyzer.genai.Client")
+    def test_analyze_batch_deletes_input_of_failed_submit(
+        self, mock_client_class: MagicMock
+    ) -> None:
+        """Test an input file whose job was not created is deleted on retry."""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+
+        first_input = self._uploaded_file("files/input1")
+        second_input = self._uploaded_file("files/input2")
+        mock_client.files.upload.side_effect = [first_input, second_input]
+        done_job = MagicMock()
+        done_job.state.name = "JOB_STATE_SUCCEEDED"
+        mock_client.batches.create.side_effect = [Exception("busy"), done_job]
+        mock_client.files.download.return_value = b""
+
+        analyzer = VideoAnalyzer(api_key="test-key")
+        with patch("src.analyzer.time.sleep"):
+            analyzer.analyze_batch([(self._uploaded_file("files/v"), "V")])
+
+        deleted = {c.kwargs["name"] for c in mock_client.files.delete.call_args_list}
+        assert deleted == {"files/input1", "files/input2", "files/v"}
+
+    @patch("src.analyzer.genai.Client")
+    def test_analyze_batch_empty(self, mock_client_class: MagicMock) -> None:
+        """Test an empty batch does not create a job."""
+        mock_client = MagicMock()
+        mock_client_class.return_value = mock_client
+
+        analyzer = VideoAnalyzer(api_key="test-key")
+
+        assert analyzer.analyze_batch([]) == []
+        mock_client.batches.create.assert_not_called()
@@ -75,11 +75,14 @@ class TestCmdListVideos:
         args = argparse.Namespace(
             profile="test_profile",
             output=None,
+            instagram_rpm=15.0,
         )
 
         cmd_list_videos(args)
 
-        mock_crawler_class.assert_called_once_with(username="user", password="pass")
+        mock_crawler_class.assert_called_once_with(
+            username="user", password="pass", requests_per_minute=15.0
+        )
         mock_crawler.list_videos.assert_called_once_with("test_profile")
         mock_save.assert_called_once()
 
@@ -102,11 +105,15 @@ class TestCmdParseShortcodes:
 
     @patch("src.cli.InstagramCrawler")
     @patch("src.cli.save_video_list")
+    @patch("src.cli.append_video_post")
     @patch.dict(
         "os.environ", {"INSTAGRAM_USERNAME": "user", "INSTAGRAM_PASSWORD": "pass"}
     )
     def test_parse_shortcodes_success(
-        self, _mock_save: MagicMock, mock_crawler_class: MagicMock
+        self,
+        mock_append: MagicMock,
+        _mock_save: MagicMock,
+        mock_crawler_class: MagicMock,
     ) -> None:
         """Test successful shortcode parsing."""
         from src.instagram import VideoPost
@@ -114,29 +121,40 @@ class TestCmdParseShortcodes:
         mock_crawler = MagicMock()
         mock_crawler_class.return_value = mock_crawler
 
-        mock_crawler.get_post_by_shortcode.return_value = VideoPost(
-            shortcode="SHORT1",
-            url="https://www.instagram.com/p/SHORT1/",
-            video_url="https://cdn.instagram.com/short1.mp4",
-        )
+        mock_crawler.get_posts_by_shortcodes.return_value = {
+            "SHORT1": VideoPost(
+                shortcode="SHORT1",
+                url="https://www.instagram.com/p/SHORT1/",
+                video_url="https://cdn.instagram.com/short1.mp4",
+            ),
+            "SHORT2": None,
+        }
 
         with tempfile.NamedTemporaryFile(mode="w", suffix=".json", delete=False) as f:
             json.dump(["SHORT1", "SHORT2"], f)
             shortcodes_file = Path(f.name)
+        output_file = shortcodes_file.with_suffix(".videos.json")
 
         try:
             args = argparse.Namespace(
                 shortcodes=str(shortcodes_file),
                 profile="test_profile",
-                output=None,
+                output=output_file,
                 fresh=False,
+                instagram_rpm=20.0,
             )
 
             cmd_parse_shortcodes(args)
 
-            mock_crawler.get_post_by_shortcode.assert_called()
+            assert mock_crawler_class.call_args.kwargs["requests_per_minute"] == 20.0
+
+            mock_crawler.get_posts_by_shortcodes.assert_called_once_with(
+                ["SHORT1", "SHORT2"]
+            )
+            assert mock_append.call_count == 1
         finally:
             shortcodes_file.unlink()
+            output_file.unlink(missing_ok=True)
 
     @patch.dict("os.environ", {}, clear=True)
     def test_parse_shortcodes_missing_credentials(self) -> None:
@@ -210,6 +228,9 @@ class TestCmdAnalyze:
                 video_list=str(video_list_file),
                 output=Path("/tmp/output"),
                 max_videos=None,
+                batch=False,
+                concurrency=1,
+                gemini_rpm=12.0,
             )
 
             cmd_analyze(args)
@@ -349,6 +370,27 @@ class TestMain:
 
         assert root.level == logging.DEBUG
 
+    def test_main_rejects_values_below_one(self) -> None:
+        """Test worker counts and request rates below 1 are argparse errors."""
+        for command, flag, value in [
+            ("analyze", "-j", "0"),
+            ("analyze", "--concurrency", "-2"),
+            ("analyze", "--gemini-rpm", "0"),
+            ("list-videos", "--instagram-rpm", "-5"),
+            ("parse-shortcodes", "--instagram-rpm", "0.5"),
+            ("analyze", "--gemini-rpm", "nan"),
+            ("analyze", "-j", "many"),
+        ]:
+            with (
+                patch("sys.argv", ["cli", command, "arg", flag, value]),
+                patch(f"src.cli.cmd_{command.replace('-', '_')}") as mock_cmd,
+                pytest.raises(SystemExit) as exc_info,
+            ):
+                main()
+
+            assert exc_info.value.code == 2  # argparse error
+            mock_cmd.assert_not_called()
+
     def test_main_no_command(self) -> None:
         """Test main exits when no command provided."""
         with patch("sys.argv", ["cli"]), pytest.raises(SystemExit) as exc_info:
@@ -1,14 +1,25 @@
 """Tests for Instagram crawler functionality."""
 
+import io
 import json
-import tempfile
+import re
+from collections.abc import Callable, Iterator
+from contextlib import ExitStack
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import pytest
+from pydantic import ValidationError
+
 from src.instagram import (
+    InstagramCrawler,
+    PostCache,
     VideoList,
     VideoPost,
+    _scan_shortcodes,
     _sleep_with_jitter,
+    append_video_post,
+    extract_shortcodes_from_bytes,
     extract_shortcodes_from_html,
     load_video_list,
     save_video_list,
@@ -64,7 +75,7 @@ class TestVideoList:
 class TestVideoListIO:
     """Tests for video list save/load functions."""
 
-    def test_save_and_load_video_list(self) -> None:
+    def test_save_and_load_video_list(self, tmp_path: Path) -> None:
         """Test saving and loading a video list."""
         videos = [
             VideoPost(
@@ -80,22 +91,17 @@ class TestVideoListIO:
             ),
         ]
         original = VideoList(profile="test_profile", videos=videos)
+        file_path = tmp_path / "videos.json"
 
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".json", delete=False) as f:
-            file_path = Path(f.name)
-
-        try:
-            save_video_list(original, file_path)
-            loaded = load_video_list(file_path)
+        save_video_list(original, file_path)
+        loaded = load_video_list(file_path)
 
-            assert loaded.profile == original.profile
-            assert len(loaded.videos) == len(original.videos)
-            assert loaded.videos[0].shortcode == "TEST1"
-            assert loaded.videos[1].shortcode == "TEST2"
-        finally:
-            file_path.unlink()
+        assert loaded.profile == original.profile
+        assert len(loaded.videos) == len(original.videos)
+        assert loaded.videos[0].shortcode == "TEST1"
+        assert loaded.videos[1].shortcode == "TEST2"
 
-    def test_load_video_list_preserves_captions(self) -> None:
+    def test_load_video_list_preserves_captions(self, tmp_path: Path) -> None:
         """Test that captions are preserved during load."""
         data = {
             "profile": "test",
@@ -108,15 +114,114 @@ class TestVideoListIO:
                 }
             ],
         }
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".json", delete=False) as f:
-            json.dump(data, f)
-            file_path = Path(f.name)
+        file_path = tmp_path / "videos.json"
+        file_path.write_text(json.dumps(data))
+
+        loaded = load_video_list(file_path)
+        assert loaded.videos[0].caption == "Caption preserved"
+
+    def test_append_video_post(self, tmp_path: Path) -> None:
+        """Test appending a video extends a saved list without rewriting it."""
+        file_path = tmp_path / "videos.json"
+        save_video_list(VideoList(profile="append_test", videos=[]), file_path)
+
+        with file_path.open("ab") as output:
+            for shortcode in ("A", "B"):
+                append_video_post(
+                    VideoPost(
+                        shortcode=shortcode,
+                        url=f"https://www.instagram.com/p/{shortcode}/",
+                        video_url=f"https://cdn.instagram.com/{shortcode}.mp4",
+                    ),
+                    output,
+                )
+
+        assert len(file_path.read_text().splitlines()) == 3
+        loaded = load_video_list(file_path)
+        assert loaded.profile == "append_test"
+        assert [v.shortcode for v in loaded.videos] == ["A", "B"]
+
+    def test_load_video_list_trusted_skips_validation(self, tmp_path: Path) -> None:
+        """Test trusted loading builds the same videos without validating."""
+        original = VideoList(
+            profile="trusted",
+            videos=[
+                VideoPost(
+                    shortcode="T1",
+                    url="https://www.instagram.com/p/T1/",
+                    video_url="https://cdn.instagram.com/t1.mp4",
+                    caption="Kept",
+                )
+            ],
+        )
+        file_path = tmp_path / "videos.json"
+        save_video_list(original, file_path)
+
+        with patch.object(VideoPost, "model_validate") as mock_validate:
+            loaded = load_video_list(file_path, trusted=True)
+
+        mock_validate.assert_not_called()
+        assert loaded == original
+
+    def test_saved_video_list_names_keys_once(self, tmp_path: Path) -> None:
+        """Test posts are written as value rows under a single key header."""
+        file_path = tmp_path / "videos.json"
+        save_video_list(
+            VideoList(
+                profile="rows",
+                videos=[
+                    VideoPost(
+                        shortcode="R1",
+                        url="https://www.instagram.com/p/R1/",
+                        video_url="https://cdn.instagram.com/r1.mp4",
+                    )
+                ],
+            ),
+            file_path,
+        )
+
+        header, row = (json.loads(line) for line in file_path.read_text().splitlines())
+        assert header == {
+            "profile": "rows",
+            "keys": ["shortcode", "url", "video_url", "caption"],
+        }
+        assert row == [
+            "R1",
+            "https://www.instagram.com/p/R1/",
+            "https://cdn.instagram.com/r1.mp4",
+            None,
+        ]
+
+    def test_load_legacy_indented_video_list(self, tmp_path: Path) -> None:
+        """Test that pretty-printed single-document lists still load."""
+        data = {
+            "profile": "legacy",
+            "videos": [
+                {
+                    "shortcode": "OLD",
+                    "url": "https://www.instagram.com/p/OLD/",
+                    "video_url": "https://cdn.instagram.com/old.mp4",
+                }
+            ],
+        }
+        file_path = tmp_path / "videos.json"
+        file_path.write_text(json.dumps(data, indent=2))
+
+        loaded = load_video_list(file_path)
+        assert loaded.profile == "legacy"
+        assert loaded.videos[0].shortcode == "OLD"
+
+    def test_load_video_list_rejects_invalid_post(self, tmp_path: Path) -> None:
+        """Test that untrusted loading still validates every post."""
+        file_path = tmp_path / "videos.json"
+        file_path.write_text(
+            '{"profile": "broken", "keys": ["shortcode", "url", "video_url"]}\n'
+            '["OK", "u", "v"]\n'
+            '["BAD", "u", null]\n'
+        )
 
-        try:
-            loaded = load_video_list(file_path)
-            assert loaded.videos[0].caption == "Caption preserved"
-        finally:
-            file_path.unlink()
+        with pytest.raises(ValidationError):
+            load_video_list(file_path)
 
 
 class TestExtractShortcodes:
@@ -124,89 +229,83 @@ class TestExtractShortcodes:
 
     def test_extract_shortcodes_from_post_urls(self) -> None:
         """Test extracting shortcodes from /p/ URLs."""
-        html = """
+        html = b"""
         <a href="/p/ABC12345678/">Post 1</a>
         <a href="/p/XYZ98765432/">Post 2</a>
         <a href="/p/DEF11111111/">Post 3</a>
         """
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".html", delete=False) as f:
-            f.write(html)
-            file_path = Path(f.name)
-
-        try:
-            shortcodes = extract_shortcodes_from_html(file_path)
-            assert len(shortcodes) == 3
-            assert "ABC12345678" in shortcodes
-            assert "XYZ98765432" in shortcodes
-            assert "DEF11111111" in shortcodes
-        finally:
-            file_path.unlink()
+        shortcodes = extract_shortcodes_from_bytes(html)
+        assert len(shortcodes) == 3
+        assert "ABC12345678" in shortcodes
+        assert "XYZ98765432" in shortcodes
+        assert "DEF11111111" in shortcodes
 
     def test_extract_shortcodes_from_reel_urls(self) -> None:
         """Test extracting shortcodes from /reel/ URLs."""
-        html = """
+        html = b"""
         <a href="/reel/REEL1234567/">Reel 1</a>
         <a href="/reel/REEL7654321/">Reel 2</a>
         """
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".html", delete=False) as f:
-            f.write(html)
-            file_path = Path(f.name)
-
-        try:
-            shortcodes = extract_shortcodes_from_html(file_path)
-            assert len(shortcodes) == 2
-            assert "REEL1234567" in shortcodes
-        finally:
-            file_path.unlink()
+        shortcodes = extract_shortcodes_from_bytes(html)
+        assert len(shortcodes) == 2
+        assert "REEL1234567" in shortcodes
 
     def test_extract_shortcodes_deduplicates(self) -> None:
         """Test that duplicate shortcodes are removed."""
-        html = """
+        html = b"""
         <a href="/p/DUPLICATE11/">First</a>
         <a href="/p/DUPLICATE11/">Second</a>
         <a href="/p/DUPLICATE11/">Third</a>
         """
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".html", delete=False) as f:
-            f.write(html)
-            file_path = Path(f.name)
-
-        try:
-            shortcodes = extract_shortcodes_from_html(file_path)
-            assert len(shortcodes) == 1
-            assert shortcodes[0] == "DUPLICATE11"
-        finally:
-            file_path.unlink()
+        assert extract_shortcodes_from_bytes(html) == ["DUPLICATE11"]
 
     def test_extract_shortcodes_preserves_order(self) -> None:
         """Test that order is preserved."""
-        html = """
+        html = b"""
         <a href="/p/FIRST111111/">First</a>
         <a href="/p/SECOND22222/">Second</a>
         <a href="/p/THIRD333333/">Third</a>
         """
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".html", delete=False) as f:
-            f.write(html)
-            file_path = Path(f.name)
-
-        try:
-            shortcodes = extract_shortcodes_from_html(file_path)
-            assert shortcodes[0] == "FIRST111111"
-            assert shortcodes[1] == "SECOND22222"
-            assert shortcodes[2] == "THIRD333333"
-        finally:
-            file_path.unlink()
-
-    def test_extract_shortcodes_empty_file(self) -> None:
+        shortcodes = extract_shortcodes_from_bytes(html)
+        assert shortcodes == ["FIRST111111", "SECOND22222", "THIRD333333"]
+
+    def test_extract_shortcodes_without_parsing_markup(self) -> None:
+        """Test links are found wherever they appear, not only in <a> tags."""
+        html = b"""
+        <a class="x1i10hfl" href='https://www.instagram.com/p/ABSOLUTE111/'>
+        <script type="application/json">{"permalink": "/reel/INSCRIPT222/"}</script>
+        <a href="/p/SHORT/">Too short to be a shortcode</a>
+        """
+        shortcodes = extract_shortcodes_from_bytes(html)
+        assert shortcodes == ["ABSOLUTE111", "INSCRIPT222"]
+
+    def test_extract_shortcodes_from_html_file(self, tmp_path: Path) -> None:
+        """Test extracting from a saved page goes through the mapped file."""
+        file_path = tmp_path / "profile.html"
+        file_path.write_text('<a href="/p/ABC12345678/">Post</a>')
+
+        assert extract_shortcodes_from_html(file_path) == ["ABC12345678"]
+
+    def test_extract_shortcodes_empty_file(self, tmp_path: Path) -> None:
         """Test extraction from empty file."""
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".html", delete=False) as f:
-            f.write("")
-            file_path = Path(f.name)
+        file_path = tmp_path / "empty.html"
+        file_path.write_text("")
+
+        assert extract_shortcodes_from_html(file_path) == []
+
+    def test_extract_shortcodes_hyperscan_offsets(self) -> None:
+        """Test shortcodes are sliced correctly from Hyperscan match offsets."""
+        html = b'<a href="/reel/REEL1234567/">R</a><a href="/p/POST1234567/">P</a>'
 
-        try:
-            shortcodes = extract_shortcodes_from_html(file_path)
-            assert shortcodes == []
-        finally:
-            file_path.unlink()
+        class FakeDatabase:
+            def scan(
+                self, data: bytes, match_event_handler: Callable[..., None]
+            ) -> None:
+                for m in re.finditer(rb"/(?:p|reel)/[A-Za-z0-9_-]{11}/", data):
+                    match_event_handler(0, m.start(), m.end(), 0, None)
+
+        with patch("src.instagram._SHORTCODE_DB", FakeDatabase()):
+            assert _scan_shortcodes(html) == [b"REEL1234567", b"POST1234567"]
 
 
 class TestSleepWithJitter:
@@ -234,6 +333,131 @@ class TestSleepWithJitter:
         mock_sleep.assert_called_once_with(7.0)
 
 
+class TestPostCache:
+    """Tests for the on-disk post cache."""
+
+    def test_post_cache_roundtrip(self, tmp_path: Path) -> None:
+        """Test cached posts, including non-videos, survive a reload."""
+        cache_file = tmp_path / ".post_cache.jsonl"
+        video = VideoPost(
+            shortcode="VID",
+            url="https://www.instagram.com/p/VID/",
+            video_url="https://cdn.instagram.com/v.mp4",
+        )
+
+        cache = PostCache(cache_file)
+        cache.put("VID", video)
+        cache.put("PHOTO", None)
+
+        reloaded = PostCache(cache_file)
+        assert reloaded["VID"] == video
+        assert "PHOTO" in reloaded
+        assert reloaded["PHOTO"] is None
+        assert "OTHER" not in reloaded
+
+    def test_post_cache_drops_expired_entries(self, tmp_path: Path) -> None:
+        """Test entries past the TTL are forgotten and pruned from disk."""
+        cache_file = tmp_path / ".post_cache.jsonl"
+        with patch("src.instagram.time.time", return_value=1000.0):
+            PostCache(cache_file).put("OLD", None)
+        with patch("src.instagram.time.time", return_value=5000.0):
+            PostCache(cache_file).put("NEW", None)
+            cache = PostCache(cache_file, ttl_seconds=3600)
+
+        assert "OLD" not in cache
+        assert "NEW" in cache
+        assert b"OLD" not in cache_file.read_bytes()
+
+    def test_post_cache_rewrite_keeps_fetch_times(self, tmp_path: Path) -> None:
+        """Test pruning one entry does not renew the TTL of the others."""
+        cache_file = tmp_path / ".post_cache.jsonl"
+        hour = 3600.0
+        with patch("src.instagram.time.time", return_value=0.0):
+            PostCache(cache_file).put("EXPIRED", None)
+        with patch("src.instagram.time.time", return_value=2 * hour):
+            PostCache(cache_file).put("OLDER", None)
+
+        # OLDER is 23h old when EXPIRED is pruned and the file rewritten
+        with patch("src.instagram.time.time", return_value=25 * hour):
+            cache = PostCache(cache_file)
+        assert "EXPIRED" not in cache
+        assert "OLDER" in cache
+
+        # ...and still expires a day after it was first fetched
+        with patch("src.instagram.time.time", return_value=27 * hour):
+            cache = PostCache(cache_file)
+        assert "OLDER" not in cache
+        assert cache_file.read_bytes() == b""
+
+    def test_post_cache_skips_malformed_lines(self, tmp_path: Path) -> None:
+        """Test lines that are not cache entries are skipped and pruned."""
+        cache_file = tmp_path / ".post_cache.jsonl"
+        PostCache(cache_file).put("GOOD", None)
+        with cache_file.open("ab") as f:
+            f.write(b'{"shortcode": "NOTIME", "post": null}\n[1, 2]\n"text"\n{"sh')
+
+        cache = PostCache(cache_file)
+
+        assert "GOOD" in cache
+        assert "NOTIME" not in cache
+        assert len(cache_file.read_bytes().splitlines()) == 1
+
+    def test_post_cache_clear(self, tmp_path: Path) -> None:
+        """Test clearing removes the cache file."""
+        cache_file = tmp_path / ".post_cache.jsonl"
+        cache = PostCache(cache_file)
+        cache.put("PHOTO", None)
+        cache.clear()
+
+        assert "PHOTO" not in cache
+        assert not cache_file.exists()
+
+
+@pytest.fixture
+def mock_sleep() -> Iterator[MagicMock]:
+    """Patch out every sleep in the crawler module."""
+    with patch("src.instagram.time.sleep") as mock:
+        yield mock
+
+
+@pytest.fixture
+def crawler(mock_sleep: MagicMock) -> Iterator[InstagramCrawler]:
+    """Build a crawler logged in against mocks, with no session file or network.
+
+    The instaloader object and the download session are MagicMocks, reachable
+    as crawler._loader and crawler._session.
+    """
+    with ExitStack() as stack:
+        stack.enter_context(patch("glob.glob", return_value=[]))
+        stack.enter_context(
+            patch("src.instagram.Path.home", return_value=Path("/fake/home"))
+        )
+        stack.enter_context(patch("src.instagram.instaloader.Instaloader"))
+        stack.enter_context(patch("src.instagram.requests.Session"))
+        crawler = InstagramCrawler("testuser", "testpass")
+        mock_sleep.reset_mock()
+        yield crawler
+
+
+def _video_post(shortcode: str, caption: str | None = None) -> MagicMock:
+    """Build a mock instaloader video post."""
+    post = MagicMock()
+    post.shortcode = shortcode
+    post.is_video = True
+    post.typename = "GraphVideo"
+    post.video_url = f"https://cdn.instagram.com/{shortcode}.mp4"
+    post.caption = caption
+    return post
+
+
+def _photo_post(shortcode: str) -> MagicMock:
+    """Build a mock instaloader photo post."""
+    post = MagicMock()
+    post.shortcode = shortcode
+    post.is_video = False
+    return post
+
+
 class TestInstagramCrawler:
     """Tests for InstagramCrawler class."""
 
@@ -243,8 +467,6 @@ class TestInstagramCrawler:
         self, mock_instaloader: MagicMock, mock_glob: MagicMock
     ) -> None:
         """Test that crawler tries to load session before login."""
-        from src.instagram import InstagramCrawler
-
         mock_loader = MagicMock()
         mock_loader.context = MagicMock()
         mock_instaloader.return_value = mock_loader
@@ -261,278 +483,238 @@ class TestInstagramCrawler:
             mock_loader.login.assert_called_once_with("testuser", "testpass")
 
     @patch("src.instagram.instaloader.Instaloader")
-    def test_crawler_uses_existing_session(self, mock_instaloader: MagicMock) -> None:
+    def test_crawler_uses_existing_session(
+        self, mock_instaloader: MagicMock, tmp_path: Path
+    ) -> None:
         """Test that crawler uses existing session if available."""
-        from src.instagram import InstagramCrawler
-
         mock_loader = MagicMock()
         mock_loader.context = MagicMock()
         mock_instaloader.return_value = mock_loader
 
+        # Create a fake session file
+        session_dir = tmp_path / ".config" / "instaloader"
+        session_dir.mkdir(parents=True)
+        (session_dir / "session-testuser").write_text("fake session")
+
         with patch("src.instagram.Path.home") as mock_home:
-            mock_home_path = Path(tempfile.mkdtemp())
-            mock_home.return_value = mock_home_path
-
-            # Create a fake session file
-            session_dir = mock_home_path / ".config" / "instaloader"
-            session_dir.mkdir(parents=True)
-            session_file = session_dir / "session-testuser"
-            session_file.write_text("fake session")
-
-            try:
-                InstagramCrawler("testuser", "testpass")
-
-                # Should have loaded session, not logged in
-                mock_loader.load_session_from_file.assert_called()
-                mock_loader.login.assert_not_called()
-            finally:
-                session_file.unlink()
-                session_dir.rmdir()
-                (mock_home_path / ".config").rmdir()
-                mock_home_path.rmdir()
+            mock_home.return_value = tmp_path
+            InstagramCrawler("testuser", "testpass")
+
+        # Should have loaded session, not logged in
+        mock_loader.load_session_from_file.assert_called()
+        mock_loader.login.assert_not_called()
 
-    @patch("glob.glob")
-    @patch("src.instagram.instaloader.Instaloader")
     def test_handle_rate_limit_exponential_backoff(
-        self, mock_instaloader: MagicMock, mock_glob: MagicMock
+        self, crawler: InstagramCrawler, mock_sleep: MagicMock
     ) -> None:
         """Test rate limit handling with exponential backoff."""
-        from src.instagram import InstagramCrawler
-
-        mock_loader = MagicMock()
-        mock_loader.context = MagicMock()
-        mock_instaloader.return_value = mock_loader
-        mock_glob.return_value = []
-
-        with patch("src.instagram.Path.home") as mock_home:
-            mock_home.return_value = Path("/fake/home")
-            with patch("src.instagram.time.sleep"):
-                crawler = InstagramCrawler("testuser", "testpass")
-
-                # Test rate limit handling
-                with patch("src.instagram.time.sleep") as mock_sleep:
-                    result = crawler._handle_rate_limit(0)
-                    assert result is True
-                    mock_sleep.assert_called_once()
+        assert crawler._handle_rate_limit(0) is True
+        mock_sleep.assert_called_once()
 
-                    # At max retries
-                    result = crawler._handle_rate_limit(5)
-                    assert result is False
+        # At max retries
+        assert crawler._handle_rate_limit(5) is False
 
-    @patch("glob.glob")
-    @patch("src.instagram.instaloader.Instaloader")
     @patch("src.instagram.instaloader.Profile")
     def test_list_videos(
-        self,
-        mock_profile_class: MagicMock,
-        mock_instaloader: MagicMock,
-        mock_glob: MagicMock,
+        self, mock_profile_class: MagicMock, crawler: InstagramCrawler
     ) -> None:
         """Test listing videos from a profile."""
-        from src.instagram import InstagramCrawler
-
-        mock_loader = MagicMock()
-        mock_loader.context = MagicMock()
-        mock_instaloader.return_value = mock_loader
-        mock_glob.return_value = []
-
-        # Mock profile
         mock_profile = MagicMock()
         mock_profile.mediacount = 2
         mock_profile_class.from_username.return_value = mock_profile
 
-        # Mock posts - one video, one non-video
-        mock_video_post = MagicMock()
-        mock_video_post.shortcode = "VIDEO1"
-        mock_video_post.is_video = True
-        mock_video_post.video_url = "https://cdn.instagram.com/video1.mp4"
-        mock_video_post.typename = "GraphVideo"
-        mock_video_post.caption = "Test video"
-
-        mock_photo_post = MagicMock()
-        mock_photo_post.shortcode = "PHOTO1"
-        mock_photo_post.is_video = False
+        # One video, one non-video
+        mock_profile.get_posts.return_value = iter(
+            [_video_post("VIDEO1", caption="Test video"), _photo_post("PHOTO1")]
+        )
 
-        mock_profile.get_posts.return_value = iter([mock_video_post, mock_photo_post])
-
-        with patch("src.instagram.Path.home") as mock_home:
-            mock_home.return_value = Path("/fake/home")
-            with patch("src.instagram.time.sleep"):
-                crawler = InstagramCrawler("testuser", "testpass")
-                result = crawler.list_videos("test_profile")
+        result = crawler.list_videos("test_profile")
 
         assert result.profile == "test_profile"
         assert len(result.videos) == 1
         assert result.videos[0].shortcode == "VIDEO1"
 
-    @patch("glob.glob")
-    @patch("src.instagram.instaloader.Instaloader")
     @patch("src.instagram.instaloader.Profile")
-    def test_get_video_posts(
-        self,
-        mock_profile_class: MagicMock,
-        mock_instaloader: MagicMock,
-        mock_glob: MagicMock,
+    def test_list_videos_resumes_after_rate_limit(
+        self, mock_profile_class: MagicMock, crawler: InstagramCrawler
     ) -> None:
-        """Test iterating over video posts."""
-        from src.instagram import InstagramCrawler
+        """Test a rate-limited listing resumes from a frozen iterator."""
+        from instaloader.exceptions import ConnectionException
 
-        mock_loader = MagicMock()
-        mock_loader.context = MagicMock()
-        mock_instaloader.return_value = mock_loader
-        mock_glob.return_value = []
+        first, second = _video_post("V1"), _video_post("V2")
+        frozen = MagicMock()
+
+        failing = MagicMock()
+        failing.__next__.side_effect = [first, ConnectionException("429")]
+        failing.freeze.return_value = frozen
+        # A thawed iterator repeats the last post before continuing
+        resumed = MagicMock()
+        resumed.__next__.side_effect = [first, second, StopIteration]
 
         mock_profile = MagicMock()
-        mock_profile.mediacount = 1
+        mock_profile.mediacount = 2
+        mock_profile.get_posts.side_effect = [failing, resumed]
+        mock_profile_class.from_username.return_value = mock_profile
 
-        mock_video = MagicMock()
-        mock_video.shortcode = "V1"
-        mock_video.is_video = True
-        mock_video.video_url = "https://cdn.instagram.com/v1.mp4"
-        mock_video.typename = "GraphVideo"
-        mock_video.caption = None
+        result = crawler.list_videos("test_profile")
 
-        mock_profile.get_posts.return_value = iter([mock_video])
+        resumed.thaw.assert_called_once_with(frozen)
+        assert mock_profile.get_posts.call_count == 2
+        assert [v.shortcode for v in result.videos] == ["V1", "V2"]
+
+    @patch("src.instagram.instaloader.Profile")
+    def test_get_video_posts(
+        self, mock_profile_class: MagicMock, crawler: InstagramCrawler
+    ) -> None:
+        """Test iterating over video posts."""
+        mock_profile = MagicMock()
+        mock_profile.mediacount = 1
+        mock_profile.get_posts.return_value = iter([_video_post("V1")])
         mock_profile_class.from_username.return_value = mock_profile
 
-        with patch("src.instagram.Path.home") as mock_home:
-            mock_home.return_value = Path("/fake/home")
-            with patch("src.instagram.time.sleep"):
-                crawler = InstagramCrawler("testuser", "testpass")
-                videos = list(crawler.get_video_posts("test", skip_shortcodes=set()))
+        videos = list(crawler.get_video_posts("test", skip_shortcodes=set()))
 
         assert len(videos) == 1
         assert videos[0].shortcode == "V1"
 
-    @patch("glob.glob")
-    @patch("src.instagram.instaloader.Instaloader")
-    @patch("src.instagram.urllib.request.urlretrieve")
-    def test_download_video(
-        self,
-        mock_urlretrieve: MagicMock,
-        mock_instaloader: MagicMock,
-        mock_glob: MagicMock,
-    ) -> None:
-        """Test downloading a video."""
-        from src.instagram import InstagramCrawler
+    def test_download_video(self, crawler: InstagramCrawler, tmp_path: Path) -> None:
+        """Test downloading a video to a file."""
+        response = crawler._session.get.return_value.__enter__()
+        response.iter_content.return_value = [b"video ", b"bytes"]
 
-        mock_loader = MagicMock()
-        mock_loader.context = MagicMock()
-        mock_instaloader.return_value = mock_loader
-        mock_glob.return_value = []
-
-        with patch("src.instagram.Path.home") as mock_home:
-            mock_home.return_value = Path("/fake/home")
-            with patch("src.instagram.time.sleep"):
-                crawler = InstagramCrawler("testuser", "testpass")
-                output_path = Path("/tmp/test_video.mp4")
-                result = crawler.download_video(
-                    "https://cdn.instagram.com/video.mp4", output_path
-                )
+        output_path = tmp_path / "test_video.mp4"
+        result = crawler.download_video(
+            "https://cdn.instagram.com/video.mp4", output_path
+        )
 
-        mock_urlretrieve.assert_called_once()
         assert result == output_path
+        assert output_path.read_bytes() == b"video bytes"
+
+    def test_download_video_to_buffer(self, crawler: InstagramCrawler) -> None:
+        """Test downloads reuse one session and fill an in-memory buffer."""
+        response = crawler._session.get.return_value.__enter__()
+        response.iter_content.return_value = [b"video ", b"bytes"]
+
+        # Stale data from a failed attempt must not survive a retry
+        buffer = io.BytesIO(b"partial download from a previous attempt")
+
+        result = crawler.download_video("https://cdn.instagram.com/video.mp4", buffer)
+        crawler.download_video("https://cdn.instagram.com/other.mp4", buffer)
+
+        assert result is buffer
+        assert buffer.tell() == 0
+        assert buffer.read() == b"video bytes"
+        assert crawler._session.get.call_count == 2
+
+    def test_warm_up_ignores_errors(self, crawler: InstagramCrawler) -> None:
+        """Test warming the CDN connection is best effort."""
+        import requests
+
+        crawler._session.head.side_effect = requests.ConnectionError("unreachable")
+
+        crawler.warm_up("https://cdn.instagram.com/video.mp4")
+
+        crawler._session.head.assert_called_once()
 
-    @patch("glob.glob")
-    @patch("src.instagram.instaloader.Instaloader")
     @patch("src.instagram.instaloader.Post")
     def test_get_post_by_shortcode(
-        self,
-        mock_post_class: MagicMock,
-        mock_instaloader: MagicMock,
-        mock_glob: MagicMock,
+        self, mock_post_class: MagicMock, crawler: InstagramCrawler
     ) -> None:
         """Test fetching a post by shortcode."""
-        from src.instagram import InstagramCrawler
-
-        mock_loader = MagicMock()
-        mock_loader.context = MagicMock()
-        mock_instaloader.return_value = mock_loader
-        mock_glob.return_value = []
+        mock_post_class.from_shortcode.return_value = _video_post(
+            "TEST1", caption="Test caption"
+        )
 
-        mock_post = MagicMock()
-        mock_post.shortcode = "TEST1"
-        mock_post.is_video = True
-        mock_post.video_url = "https://cdn.instagram.com/test1.mp4"
-        mock_post.typename = "GraphVideo"
-        mock_post.caption = "Test caption"
-        mock_post_class.from_shortcode.return_value = mock_post
-
-        with patch("src.instagram.Path.home") as mock_home:
-            mock_home.return_value = Path("/fake/home")
-            with patch("src.instagram.time.sleep"):
-                crawler = InstagramCrawler("testuser", "testpass")
-                result = crawler.get_post_by_shortcode("TEST1")
+        result = crawler.get_post_by_shortcode("TEST1")
 
         assert result is not None
         assert result.shortcode == "TEST1"
-        assert result.video_url == "https://cdn.instagram.com/test1.mp4"
+        assert result.video_url == "https://cdn.instagram.com/TEST1.mp4"
 
-    @patch("glob.glob")
-    @patch("src.instagram.instaloader.Instaloader")
     @patch("src.instagram.instaloader.Post")
     def test_get_post_by_shortcode_not_video(
+        self, mock_post_class: MagicMock, crawler: InstagramCrawler
+    ) -> None:
+        """Test fetching a non-video post returns None."""
+        mock_post_class.from_shortcode.return_value = _photo_post("PHOTO1")
+
+        assert crawler.get_post_by_shortcode("PHOTO1") is None
+
+    @patch("src.instagram.instaloader.Post")
+    def test_get_posts_by_shortcodes(
         self,
         mock_post_class: MagicMock,
-        mock_instaloader: MagicMock,
-        mock_glob: MagicMock,
+        crawler: InstagramCrawler,
+        mock_sleep: MagicMock,
     ) -> None:
-        """Test fetching a non-video post returns None."""
-        from src.instagram import InstagramCrawler
+        """Test batched fetching paces once and maps results by shortcode."""
+        video_post = _video_post("v")
+        photo_post = _photo_post("p")
+
+        # VID succeeds, PHOTO is not a video, FLAKY fails once then succeeds
+        # on the retrying path, GONE always fails. Posts are fetched from
+        # several threads, so responses are keyed by shortcode, not order.
+        responses = {
+            "VID": [video_post],
+            "PHOTO": [photo_post],
+            "FLAKY": [Exception("Temporary error"), video_post],
+            "GONE": [Exception("Not found"), Exception("Not found")],
+        }
 
-        mock_loader = MagicMock()
-        mock_loader.context = MagicMock()
-        mock_instaloader.return_value = mock_loader
-        mock_glob.return_value = []
+        def from_shortcode(_context: object, shortcode: str) -> MagicMock:
+            response = responses[shortcode].pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
 
-        mock_post = MagicMock()
-        mock_post.shortcode = "PHOTO1"
-        mock_post.is_video = False
-        mock_post_class.from_shortcode.return_value = mock_post
+        mock_post_class.from_shortcode.side_effect = from_shortcode
 
-        with patch("src.instagram.Path.home") as mock_home:
-            mock_home.return_value = Path("/fake/home")
-            with patch("src.instagram.time.sleep"):
-                crawler = InstagramCrawler("testuser", "testpass")
-                result = crawler.get_post_by_shortcode("PHOTO1")
+        posts = crawler.get_posts_by_shortcodes(["VID", "PHOTO", "FLAKY", "GONE"])
 
-        assert result is None
+        assert posts["VID"].video_url == "https://cdn.instagram.com/v.mp4"
+        assert posts["PHOTO"] is None
+        assert posts["FLAKY"].shortcode == "FLAKY"
+        assert "GONE" not in posts
+        assert list(posts) == ["VID", "PHOTO", "FLAKY"]
+        # The batch uses the bucket's initial token; each fallback fetch waits
+        assert mock_sleep.call_count == 2
 
-    @patch("glob.glob")
-    @patch("src.instagram.instaloader.Instaloader")
-    def test_get_video_url_sidecar(
-        self, mock_instaloader: MagicMock, mock_glob: MagicMock
+    @patch("src.instagram.instaloader.Post")
+    def test_get_posts_by_shortcodes_uses_cache(
+        self, mock_post_class: MagicMock, crawler: InstagramCrawler, tmp_path: Path
     ) -> None:
-        """Test getting video URL from GraphSidecar post."""
-        from src.instagram import InstagramCrawler
+        """Test cached shortcodes are not fetched and new fetches are cached."""
+        mock_post_class.from_shortcode.return_value = _photo_post("NEW")
 
-        mock_loader = MagicMock()
-        mock_loader.context = MagicMock()
-        mock_instaloader.return_value = mock_loader
-        mock_glob.return_value = []
+        cache = PostCache(tmp_path / ".post_cache.jsonl")
+        cache.put("CACHED", None)
+        crawler._post_cache = cache
 
-        with patch("src.instagram.Path.home") as mock_home:
-            mock_home.return_value = Path("/fake/home")
-            with patch("src.instagram.time.sleep"):
-                crawler = InstagramCrawler("testuser", "testpass")
+        posts = crawler.get_posts_by_shortcodes(["CACHED", "NEW"])
+        assert crawler.get_post_by_shortcode("NEW") is None
 
-                # Test GraphSidecar with video
-                mock_sidecar_post = MagicMock()
-                mock_sidecar_post.typename = "GraphSidecar"
+        assert posts == {"CACHED": None, "NEW": None}
+        mock_post_class.from_shortcode.assert_called_once()
+        assert mock_post_class.from_shortcode.call_args.args[1] == "NEW"
+        assert "NEW" in cache
 
-                mock_video_node = MagicMock()
-                mock_video_node.is_video = True
-                mock_video_node.video_url = (
-                    "https://cdn.instagram.com/sidecar_video.mp4"
-                )
+    def test_get_video_url_sidecar(self, crawler: InstagramCrawler) -> None:
+        """Test getting video URL from GraphSidecar post."""
+        # Test GraphSidecar with video
+        mock_sidecar_post = MagicMock()
+        mock_sidecar_post.typename = "GraphSidecar"
 
-                mock_photo_node = MagicMock()
-                mock_photo_node.is_video = False
+        mock_video_node = MagicMock()
+        mock_video_node.is_video = True
+        mock_video_node.video_url = "https://cdn.instagram.com/sidecar_video.mp4"
 
-                mock_sidecar_post.get_sidecar_nodes.return_value = [
-                    mock_photo_node,
-                    mock_video_node,
-                ]
+        mock_photo_node = MagicMock()
+        mock_photo_node.is_video = False
+
+        mock_sidecar_post.get_sidecar_nodes.return_value = [
+            mock_photo_node,
+            mock_video_node,
+        ]
 
-                result = crawler._get_video_url(mock_sidecar_post)
-                assert result == "https://cdn.instagram.com/sidecar_video.mp4"
+        result = crawler._get_video_url(mock_sidecar_post)
+        assert result == "https://cdn.instagram.com/sidecar_video.mp4"
@@ -4,10 +4,12 @@ import pytest
 from pydantic import ValidationError
 
 from src.models import (
+    VIDEO_RESULT_ADAPTER,
     ExerciseAnalysis,
     GeneralInsights,
     ProgressState,
     VideoResult,
+    post_url,
 )
 
 
@@ -147,6 +149,22 @@ class TestVideoResult:
         restored = VideoResult.model_validate_json(json_str)
         assert restored == result
 
+    def test_video_result_adapter_matches_model(self) -> None:
+        """Test the shared adapter reads and writes the model's JSON."""
+        result = VideoResult(
+            shortcode="TEST02",
+            url="https://www.instagram.com/p/TEST02/",
+            is_exercise_video=False,
+            error="boom",
+        )
+        data = VIDEO_RESULT_ADAPTER.dump_json(result)
+        assert data == result.model_dump_json().encode()
+        assert VIDEO_RESULT_ADAPTER.validate_json(data) == result
+
+    def test_post_url(self) -> None:
+        """Test post URLs are built from the shortcode."""
+        assert post_url("TEST03") == "https://www.instagram.com/p/TEST03/"
+
 
 class TestProgressState:
     """Tests for ProgressState model."""
@@ -158,7 +176,7 @@ class TestProgressState:
             results_file="/path/to/results.jsonl",
         )
         assert state.profile == "test_user"
-        assert state.processed_shortcodes == []
+        assert state.processed_shortcodes == set()
         assert state.results_file == "/path/to/results.jsonl"
 
     def test_progress_state_with_processed(self) -> None:
@@ -171,6 +189,17 @@ class TestProgressState:
         assert len(state.processed_shortcodes) == 2
         assert "ABC123" in state.processed_shortcodes
 
+    def test_progress_state_dedupes_shortcodes(self) -> None:
+        """Test duplicate shortcodes from an old progress file collapse."""
+        state = ProgressState.model_validate(
+            {
+                "profile": "test_user",
+                "processed_shortcodes": ["A", "B", "A"],
+                "results_file": "/path/to/results.jsonl",
+            }
+        )
+        assert state.processed_shortcodes == {"A", "B"}
+
     def test_progress_state_json_roundtrip(self) -> None:
         """Test JSON serialization and deserialization."""
         state = ProgressState(
@@ -181,3 +210,32 @@ class TestProgressState:
         json_str = state.model_dump_json()
         restored = ProgressState.model_validate_json(json_str)
         assert restored == state
+
+    def test_progress_state_trusted(self) -> None:
+        """Test building from a snapshot without validating each shortcode."""
+        data = {
+            "profile": "gym_trainer",
+            "processed_shortcodes": ["A", "B", "A"],
+            "results_file": "results.jsonl",
+        }
+        state = ProgressState.trusted(data)
+        assert state == ProgressState.model_validate(data)
+
+    def test_progress_state_trusted_count_only(self) -> None:
+        """Test a snapshot that only counts its shortcodes starts with none."""
+        state = ProgressState.trusted(
+            {
+                "profile": "gym_trainer",
+                "results_file": "results.jsonl",
+                "processed_count": 3,
+            }
+        )
+        assert state.profile == "gym_trainer"
+        assert state.processed_shortcodes == set()
+
+    def test_progress_state_trusted_rejects_bad_shape(self) -> None:
+        """Test a snapshot with the wrong top-level shape is rejected."""
+        with pytest.raises(ValueError):
+            ProgressState.trusted({"profile": "gym_trainer"})
+        with pytest.raises(ValueError):
+            ProgressState.trusted(["not", "a", "dict"])
@@ -1,18 +1,32 @@
 """Tests for the analysis pipeline."""
 
-import json
-import tempfile
+import io
+import os
+import threading
+import time
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import orjson
+import pytest
+
 from src.instagram import VideoList, VideoPost
 from src.models import ExerciseAnalysis, VideoResult
 from src.pipeline import (
-    _append_result,
+    VIDEO_SPOOL_MAX_BYTES,
+    _checkpoint,
     _get_progress_file,
+    _get_progress_log,
     _get_results_file,
     _load_progress,
+    _mark_processed,
+    _new_video_buffer,
+    _process_videos,
+    _record_results,
+    _ResultsWriter,
     _save_progress,
+    _spool_dir,
+    load_results,
 )
 
 
@@ -31,80 +45,259 @@ class TestPathHelpers:
         path = _get_results_file("test_profile", output_dir)
         assert path == Path("/tmp/test/results_test_profile.jsonl")
 
+    def test_get_progress_log(self) -> None:
+        """Test progress log path generation."""
+        output_dir = Path("/tmp/test")
+        path = _get_progress_log("test_profile", output_dir)
+        assert path == Path("/tmp/test/.processed_test_profile.txt")
+
 
 class TestProgressManagement:
     """Tests for progress state management."""
 
-    def test_load_progress_new(self) -> None:
+    def test_load_progress_new(self, tmp_path: Path) -> None:
         """Test loading progress when no file exists."""
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            output_dir = Path(tmp_dir)
-            state = _load_progress("new_profile", output_dir)
+        state = _load_progress("new_profile", tmp_path)
 
-            assert state.profile == "new_profile"
-            assert state.processed_shortcodes == []
-            assert "results_new_profile.jsonl" in state.results_file
+        assert state.profile == "new_profile"
+        assert state.processed_shortcodes == set()
+        assert "results_new_profile.jsonl" in state.results_file
 
-    def test_load_progress_existing(self) -> None:
+    def test_load_progress_existing(self, tmp_path: Path) -> None:
         """Test loading existing progress state."""
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            output_dir = Path(tmp_dir)
-            progress_file = output_dir / ".progress_test.json"
-
-            # Write existing progress
-            progress_data = {
-                "profile": "test",
-                "processed_shortcodes": ["A", "B", "C"],
+        progress_file = tmp_path / ".progress_test.json"
+
+        # Write existing progress
+        progress_data = {
+            "profile": "test",
+            "results_file": "/some/path/results.jsonl",
+            "processed_count": 3,
+        }
+        progress_file.write_bytes(orjson.dumps(progress_data))
+        _get_progress_log("test", tmp_path).write_text("A\nB\nC\n")
+
+        state = _load_progress("test", tmp_path)
+
+        assert state.profile == "test"
+        assert state.results_file == "/some/path/results.jsonl"
+        assert len(state.processed_shortcodes) == 3
+        assert "A" in state.processed_shortcodes
+
+    def test_load_progress_corrupted_file(self, tmp_path: Path) -> None:
+        """Test loading progress with corrupted file creates new state."""
+        progress_file = tmp_path / ".progress_corrupted.json"
+        progress_file.write_text("not valid json")
+
+        state = _load_progress("corrupted", tmp_path)
+
+        # Should return fresh state
+        assert state.profile == "corrupted"
+        assert state.processed_shortcodes == set()
+
+    def test_load_progress_rejects_non_object_snapshot(self, tmp_path: Path) -> None:
+        """Test empty or BOM-prefixed snapshots fall back to a fresh state."""
+        progress_file = _get_progress_file("prefix", tmp_path)
+        snapshot = orjson.dumps(
+            {
+                "profile": "prefix",
+                "processed_shortcodes": ["A"],
                 "results_file": "/some/path/results.jsonl",
             }
-            progress_file.write_text(json.dumps(progress_data))
+        )
 
-            state = _load_progress("test", output_dir)
+        for content in [b"", b"\xef\xbb\xbf" + snapshot, b'["A"]']:
+            progress_file.write_bytes(content)
 
-            assert state.profile == "test"
-            assert len(state.processed_shortcodes) == 3
-            assert "A" in state.processed_shortcodes
+            state = _load_progress("prefix", tmp_path)
 
-    def test_load_progress_corrupted_file(self) -> None:
-        """Test loading progress with corrupted file creates new state."""
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            output_dir = Path(tmp_dir)
-            progress_file = output_dir / ".progress_corrupted.json"
-            progress_file.write_text("not valid json")
+            assert state.processed_shortcodes == set()
+            assert state.results_file == str(_get_results_file("prefix", tmp_path))
 
-            state = _load_progress("corrupted", output_dir)
+    def test_load_progress_skips_leading_whitespace(self, tmp_path: Path) -> None:
+        """Test a snapshot preceded by JSON whitespace still loads."""
+        progress_file = _get_progress_file("padded", tmp_path)
+        snapshot = orjson.dumps(
+            {
+                "profile": "padded",
+                "results_file": "/some/path/results.jsonl",
+                "processed_count": 0,
+            }
+        )
+        progress_file.write_bytes(b" \t\r\n" + snapshot)
+
+        state = _load_progress("padded", tmp_path)
 
-            # Should return fresh state
-            assert state.profile == "corrupted"
-            assert state.processed_shortcodes == []
+        assert state.results_file == "/some/path/results.jsonl"
 
-    def test_save_progress(self) -> None:
+    def test_save_progress(self, tmp_path: Path) -> None:
         """Test saving progress state."""
         from src.models import ProgressState
 
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            output_dir = Path(tmp_dir)
+        state = ProgressState(
+            profile="save_test",
+            processed_shortcodes=["X", "Y", "Z"],
+            results_file="/path/to/results.jsonl",
+        )
 
-            state = ProgressState(
-                profile="save_test",
-                processed_shortcodes=["X", "Y", "Z"],
-                results_file="/path/to/results.jsonl",
+        progress_file = _get_progress_file("save_test", tmp_path)
+        _save_progress(state, progress_file)
+
+        assert progress_file == tmp_path / ".progress_save_test.json"
+        assert progress_file.exists()
+
+        # The shortcodes live in the progress log; the snapshot only counts them
+        loaded = orjson.loads(progress_file.read_bytes())
+        assert loaded == {
+            "profile": "save_test",
+            "results_file": "/path/to/results.jsonl",
+            "processed_count": 3,
+        }
+
+    def test_load_progress_drops_torn_log_line(self, tmp_path: Path) -> None:
+        """Test a log line cut short by a crash is ignored and removed."""
+        log_path = _get_progress_log("torn_test", tmp_path)
+        log_path.write_text("A\nB\nCD")
+
+        state = _load_progress("torn_test", tmp_path)
+
+        assert state.processed_shortcodes == {"A", "B"}
+        # The torn line is dropped so the next append starts on a fresh line
+        assert log_path.read_text() == "A\nB\n"
+
+    def test_load_progress_moves_inline_shortcodes_to_log(self, tmp_path: Path) -> None:
+        """Test shortcodes listed in an older snapshot are moved to the log."""
+        progress_file = _get_progress_file("log_test", tmp_path)
+        progress_file.write_bytes(
+            orjson.dumps(
+                {
+                    "profile": "log_test",
+                    "processed_shortcodes": ["A", "B"],
+                    "results_file": "/some/path/results.jsonl",
+                }
             )
+        )
+        # B is in both; the last line was cut short by a crash
+        log_path = _get_progress_log("log_test", tmp_path)
+        log_path.write_text("B\nC\nDE")
+
+        state = _load_progress("log_test", tmp_path)
+
+        assert state.processed_shortcodes == {"A", "B", "C"}
+        assert state.results_file == "/some/path/results.jsonl"
+        assert set(log_path.read_text().splitlines()) == {"A", "B", "C"}
+        snapshot = orjson.loads(progress_file.read_bytes())
+        assert "processed_shortcodes" not in snapshot
+        assert _load_progress("log_test", tmp_path) == state
+
+    def test_checkpoint_keeps_log(self, tmp_path: Path) -> None:
+        """Test a checkpoint records the count and leaves the log growing."""
+        state = _load_progress("ckpt_test", tmp_path)
+        progress_file = _get_progress_file("ckpt_test", tmp_path)
+        log_path = _get_progress_log("ckpt_test", tmp_path)
+
+        with log_path.open("a", buffering=1) as progress_log:
+            _mark_processed(state, ["A", "B"], progress_log)
+            _checkpoint(state, progress_file, progress_log)
+            snapshot = orjson.loads(progress_file.read_bytes())
+            assert snapshot["processed_count"] == 2
+
+            _mark_processed(state, ["C"], progress_log)
+
+        assert log_path.read_text() == "A\nB\nC\n"
+        assert not progress_file.with_name(progress_file.name + ".tmp").exists()
+        resumed = _load_progress("ckpt_test", tmp_path)
+        assert resumed.processed_shortcodes == {"A", "B", "C"}
+
+    def test_mark_processed_appends_without_snapshot(self, tmp_path: Path) -> None:
+        """Test each processed video adds one log line and no snapshot rewrite."""
+        state = _load_progress("delta_test", tmp_path)
+        progress_file = _get_progress_file("delta_test", tmp_path)
+        log_path = _get_progress_log("delta_test", tmp_path)
+
+        with log_path.open("a", buffering=1) as progress_log:
+            for i in range(5):
+                _mark_processed(state, [f"V{i}"], progress_log)
+
+        assert len(log_path.read_text().splitlines()) == 5
+        assert not progress_file.exists()
+        resumed = _load_progress("delta_test", tmp_path)
+        assert resumed.processed_shortcodes == {f"V{i}" for i in range(5)}
+
+    def test_record_results_snapshots_at_interval(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """Test crossing the snapshot interval writes a snapshot of the count."""
+        monkeypatch.setattr("src.pipeline.PROGRESS_SNAPSHOT_INTERVAL", 2)
+        state = _load_progress("interval_test", tmp_path)
+        progress_file = _get_progress_file("interval_test", tmp_path)
+        log_path = _get_progress_log("interval_test", tmp_path)
+
+        def finished(shortcode: str) -> list[tuple[VideoPost, VideoResult]]:
+            url = f"https://www.instagram.com/p/{shortcode}/"
+            return [
+                (
+                    VideoPost(shortcode=shortcode, url=url, video_url=url),
+                    VideoResult(shortcode=shortcode, url=url, is_exercise_video=False),
+                )
+            ]
+
+        with (
+            _ResultsWriter(tmp_path / "results.jsonl") as writer,
+            log_path.open("a", buffering=1) as progress_log,
+        ):
+            _record_results(finished("A"), state, writer, progress_log, progress_file)
+            assert not progress_file.exists()
+
+            _record_results(finished("B"), state, writer, progress_log, progress_file)
+            snapshot = orjson.loads(progress_file.read_bytes())
+            assert snapshot["processed_count"] == 2
+
+            _record_results(finished("C"), state, writer, progress_log, progress_file)
+            snapshot = orjson.loads(progress_file.read_bytes())
+            assert snapshot["processed_count"] == 2
+
+        assert log_path.read_text().splitlines() == ["A", "B", "C"]
+
+
+class TestVideoBuffer:
+    """Tests for the spooled video buffers."""
+
+    def test_spool_dir_prefers_env(self) -> None:
+        """Test PIPELINE_TMPDIR overrides the default spill directory."""
+        with patch.dict("os.environ", {"PIPELINE_TMPDIR": "/custom/tmp"}):
+            assert _spool_dir() == "/custom/tmp"
+
+    @patch.dict("os.environ", {}, clear=True)
+    @patch("src.pipeline.shutil.disk_usage")
+    def test_spool_dir_skips_full_shm(self, mock_disk_usage: MagicMock) -> None:
+        """Test a nearly full /dev/shm falls back to the system temp dir."""
+        mock_disk_usage.return_value = MagicMock(free=1 << 20)
+        with patch("src.pipeline.Path.is_dir", return_value=True):
+            assert _spool_dir() is None
+
+    @patch("src.pipeline.tempfile.SpooledTemporaryFile")
+    def test_video_buffer_spills_to_spool_dir(self, mock_spooled: MagicMock) -> None:
+        """Test video buffers spill large videos into the spool dir."""
+        with patch.dict("os.environ", {"PIPELINE_TMPDIR": "/custom/tmp"}):
+            _new_video_buffer()
+
+        mock_spooled.assert_called_once_with(
+            max_size=VIDEO_SPOOL_MAX_BYTES, suffix=".mp4", dir="/custom/tmp"
+        )
 
-            _save_progress(state, output_dir)
-
-            progress_file = output_dir / ".progress_save_test.json"
-            assert progress_file.exists()
-
-            loaded = json.loads(progress_file.read_text())
-            assert loaded["profile"] == "save_test"
-            assert len(loaded["processed_shortcodes"]) == 3
+    def test_small_video_creates_no_file(self, tmp_path: Path) -> None:
+        """Test videos under the spool limit never touch the filesystem."""
+        with patch.dict("os.environ", {"PIPELINE_TMPDIR": str(tmp_path)}):
+            for _ in range(3):
+                with _new_video_buffer() as buffer:
+                    buffer.write(b"video content")
+                    assert list(tmp_path.iterdir()) == []
 
 
-class TestAppendResult:
-    """Tests for result appending."""
+class TestResultsFile:
+    """Tests for writing and reading the results file."""
 
-    def test_append_result_new_file(self) -> None:
+    def test_append_result_new_file(self, tmp_path: Path) -> None:
         """Test appending result to new file."""
         analysis = ExerciseAnalysis(
             muscle_group="chest",
@@ -119,27 +312,22 @@ class TestAppendResult:
             is_exercise_video=True,
             exercise_analysis=analysis,
         )
+        results_file = tmp_path / "results.jsonl"
 
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".jsonl", delete=False) as f:
-            results_file = Path(f.name)
-
-        try:
-            _append_result(result, results_file)
-
-            lines = results_file.read_text().strip().split("\n")
-            assert len(lines) == 1
+        with _ResultsWriter(results_file) as writer:
+            writer.append([result])
 
-            parsed = VideoResult.model_validate_json(lines[0])
-            assert parsed.shortcode == "NEW1"
-        finally:
-            results_file.unlink()
+        parsed = list(load_results(results_file))
+        assert len(parsed) == 1
+        assert parsed[0].shortcode == "NEW1"
+        assert parsed[0].exercise_analysis == analysis
 
-    def test_append_result_existing_file(self) -> None:
+    def test_append_result_existing_file(self, tmp_path: Path) -> None:
         """Test appending multiple results."""
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".jsonl", delete=False) as f:
-            results_file = Path(f.name)
+        results_file = tmp_path / "results.jsonl"
+        results_file.write_text("")
 
-        try:
+        with _ResultsWriter(results_file) as writer:
             for i in range(3):
                 result = VideoResult(
                     shortcode=f"MULTI{i}",
@@ -147,12 +335,79 @@ class TestAppendResult:
                     is_exercise_video=False,
                     error="test error",
                 )
-                _append_result(result, results_file)
+                writer.append([result])
+                # Each line is on disk before the next result arrives
+                assert results_file.read_text().count("\n") == i + 1
+
+        parsed = list(load_results(results_file))
+        assert len(parsed) == 3
+        assert all(r.error == "test error" for r in parsed)
+
+    def test_append_writes_group_in_one_write(self, tmp_path: Path) -> None:
+        """Test a group of results is written with a single write call."""
+        results_file = tmp_path / "results.jsonl"
+        results = [
+            VideoResult(
+                shortcode=f"GROUP{i}",
+                url=f"https://www.instagram.com/p/GROUP{i}/",
+                is_exercise_video=False,
+            )
+            for i in range(3)
+        ]
+
+        with (
+            _ResultsWriter(results_file) as writer,
+            patch("src.pipeline.os.write", wraps=os.write) as mock_write,
+        ):
+            writer.append(results)
+
+        assert mock_write.call_count == 1
+        assert [r.shortcode for r in load_results(results_file)] == [
+            "GROUP0",
+            "GROUP1",
+            "GROUP2",
+        ]
+
+    def test_results_writer_reuses_fd(self, tmp_path: Path) -> None:
+        """Test the results file is opened once however many results follow."""
+        results_file = tmp_path / "results.jsonl"
+
+        with patch("src.pipeline.os.open", wraps=os.open) as mock_open:
+            writer = _ResultsWriter(results_file)
+            for i in range(3):
+                writer.append(
+                    [
+                        VideoResult(
+                            shortcode=f"FD{i}",
+                            url=f"https://www.instagram.com/p/FD{i}/",
+                            is_exercise_video=False,
+                        )
+                    ]
+                )
+            writer.close()
+            writer.close()
+
+        mock_open.assert_called_once()
+        assert len(list(load_results(results_file))) == 3
+
+    def test_load_results_streams_appended_results(self, tmp_path: Path) -> None:
+        """Test results from separate runs are read back in order."""
+        results_file = tmp_path / "results.jsonl"
+        for run in range(2):
+            with _ResultsWriter(results_file) as writer:
+                writer.append(
+                    [
+                        VideoResult(
+                            shortcode=f"RUN{run}",
+                            url=f"https://www.instagram.com/p/RUN{run}/",
+                            is_exercise_video=False,
+                        )
+                    ]
+                )
 
-            lines = results_file.read_text().strip().split("\n")
-            assert len(lines) == 3
-        finally:
-            results_file.unlink()
+        results = load_results(results_file)
+        assert not isinstance(results, list)
+        assert [r.shortcode for r in results] == ["RUN0", "RUN1"]
 
 
 class TestRunPipeline:
@@ -161,7 +416,10 @@ class TestRunPipeline:
     @patch("src.pipeline.InstagramCrawler")
     @patch("src.pipeline.VideoAnalyzer")
     def test_pipeline_processes_videos(
-        self, mock_analyzer_class: MagicMock, mock_crawler_class: MagicMock
+        self,
+        mock_analyzer_class: MagicMock,
+        mock_crawler_class: MagicMock,
+        tmp_path: Path,
     ) -> None:
         """Test pipeline processes videos correctly."""
         from src.pipeline import run_pipeline_from_file
@@ -199,41 +457,44 @@ class TestRunPipeline:
             ],
         )
 
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            output_dir = Path(tmp_dir)
+        run_pipeline_from_file(
+            video_list=video_list,
+            api_key="test-key",
+            output_dir=tmp_path,
+            instagram_username="user",
+            instagram_password="pass",
+            max_videos=1,
+        )
 
-            with patch("src.pipeline.tempfile.NamedTemporaryFile") as mock_tmp:
-                # Mock temp file
-                mock_tmp_file = MagicMock()
-                mock_tmp_file.__enter__ = MagicMock(return_value=mock_tmp_file)
-                mock_tmp_file.__exit__ = MagicMock(return_value=False)
-                mock_tmp_file.name = "/tmp/fake_video.mp4"
-                mock_tmp.return_value = mock_tmp_file
+        # Check that crawler was initialized
+        mock_crawler_class.assert_called_once_with(username="user", password="pass")
 
-                with patch("src.pipeline.Path") as mock_path:
-                    mock_video_path = MagicMock()
-                    mock_video_path.exists.return_value = True
-                    mock_path.return_value = mock_video_path
+        # Check that analyzer was initialized
+        mock_analyzer_class.assert_called_once_with(
+            api_key="test-key", requests_per_minute=12.0
+        )
 
-                    run_pipeline_from_file(
-                        video_list=video_list,
-                        api_key="test-key",
-                        output_dir=output_dir,
-                        instagram_username="user",
-                        instagram_password="pass",
-                        max_videos=1,
-                    )
+        # The downloaded bytes go straight to the analyzer, no file path
+        downloaded = mock_crawler.download_video.call_args.args[1]
+        analyzed = mock_analyzer.analyze.call_args.args[0]
+        assert analyzed is downloaded
+        assert not isinstance(analyzed, Path)
 
-            # Check that crawler was initialized
-            mock_crawler_class.assert_called_once_with(username="user", password="pass")
+        # The CDN connection was opened before the first download
+        mock_crawler.warm_up.assert_called_once_with(
+            "https://cdn.instagram.com/test1.mp4"
+        )
 
-            # Check that analyzer was initialized
-            mock_analyzer_class.assert_called_once_with(api_key="test-key")
+        # Uploads queued for deletion are cleaned up at the end of the run
+        mock_analyzer.close.assert_called_once()
 
     @patch("src.pipeline.InstagramCrawler")
     @patch("src.pipeline.VideoAnalyzer")
     def test_pipeline_skips_processed(
-        self, mock_analyzer_class: MagicMock, mock_crawler_class: MagicMock
+        self,
+        mock_analyzer_class: MagicMock,
+        mock_crawler_class: MagicMock,
+        tmp_path: Path,
     ) -> None:
         """Test pipeline skips already processed videos."""
         from src.pipeline import run_pipeline_from_file
@@ -260,53 +521,95 @@ class TestRunPipeline:
             ],
         )
 
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            output_dir = Path(tmp_dir)
+        # Create existing progress
+        progress_data = {
+            "profile": "skip_test",
+            "results_file": str(tmp_path / "results_skip_test.jsonl"),
+            "processed_count": 1,
+        }
+        progress_file = tmp_path / ".progress_skip_test.json"
+        progress_file.write_bytes(orjson.dumps(progress_data))
+        (tmp_path / ".processed_skip_test.txt").write_text("PROCESSED\n")
+
+        # Mock analyzer
+        mock_analyzer.analyze.return_value = VideoResult(
+            shortcode="NEW",
+            url="https://www.instagram.com/p/NEW/",
+            is_exercise_video=False,
+            error="test",
+        )
 
-            # Create existing progress
-            progress_data = {
-                "profile": "skip_test",
-                "processed_shortcodes": ["PROCESSED"],
-                "results_file": str(output_dir / "results_skip_test.jsonl"),
-            }
-            progress_file = output_dir / ".progress_skip_test.json"
-            progress_file.write_text(json.dumps(progress_data))
+        run_pipeline_from_file(
+            video_list=video_list,
+            api_key="test-key",
+            output_dir=tmp_path,
+            instagram_username="user",
+            instagram_password="pass",
+        )
 
-            # Mock analyzer
-            mock_analyzer.analyze.return_value = VideoResult(
-                shortcode="NEW",
-                url="https://www.instagram.com/p/NEW/",
-                is_exercise_video=False,
-                error="test",
+        # Only NEW should be analyzed, PROCESSED should be skipped
+        assert mock_analyzer.analyze.call_count == 1
+
+    @patch("src.pipeline.InstagramCrawler", MagicMock())
+    @patch("src.pipeline.VideoAnalyzer")
+    def test_pipeline_skips_large_history(
+        self, mock_analyzer_class: MagicMock, tmp_path: Path
+    ) -> None:
+        """Test a long processed history leaves only the new video to analyze."""
+        from src.pipeline import run_pipeline_from_file
+
+        mock_analyzer = MagicMock()
+        mock_analyzer_class.return_value = mock_analyzer
+        mock_analyzer.analyze.return_value = VideoResult(
+            shortcode="NEW",
+            url="https://www.instagram.com/p/NEW/",
+            is_exercise_video=False,
+            error="test",
+        )
+
+        processed = [f"OLD{i}" for i in range(10_000)]
+        video_list = VideoList(
+            profile="history_test",
+            videos=[
+                VideoPost(
+                    shortcode=shortcode,
+                    url=f"https://www.instagram.com/p/{shortcode}/",
+                    video_url=f"https://cdn.instagram.com/{shortcode}.mp4",
+                )
+                for shortcode in [*processed, "NEW"]
+            ],
+        )
+
+        (tmp_path / ".progress_history_test.json").write_bytes(
+            orjson.dumps(
+                {
+                    "profile": "history_test",
+                    "results_file": str(tmp_path / "results.jsonl"),
+                    "processed_count": len(processed),
+                }
             )
+        )
+        (tmp_path / ".processed_history_test.txt").write_text(
+            "".join(shortcode + "\n" for shortcode in processed)
+        )
+
+        run_pipeline_from_file(
+            video_list=video_list,
+            api_key="test-key",
+            output_dir=tmp_path,
+            instagram_username="user",
+            instagram_password="pass",
+        )
 
-            with patch("src.pipeline.tempfile.NamedTemporaryFile") as mock_tmp:
-                mock_tmp_file = MagicMock()
-                mock_tmp_file.__enter__ = MagicMock(return_value=mock_tmp_file)
-                mock_tmp_file.__exit__ = MagicMock(return_value=False)
-                mock_tmp_file.name = "/tmp/fake_video.mp4"
-                mock_tmp.return_value = mock_tmp_file
-
-                with patch("src.pipeline.Path") as mock_path:
-                    mock_video_path = MagicMock()
-                    mock_video_path.exists.return_value = True
-                    mock_path.return_value = mock_video_path
-
-                    run_pipeline_from_file(
-                        video_list=video_list,
-                        api_key="test-key",
-                        output_dir=output_dir,
-                        instagram_username="user",
-                        instagram_password="pass",
-                    )
-
-            # Only NEW should be analyzed, PROCESSED should be skipped
-            assert mock_analyzer.analyze.call_count == 1
+        mock_analyzer.analyze.assert_called_once()
 
     @patch("src.pipeline.InstagramCrawler")
     @patch("src.pipeline.VideoAnalyzer")
     def test_pipeline_respects_max_videos(
-        self, mock_analyzer_class: MagicMock, mock_crawler_class: MagicMock
+        self,
+        mock_analyzer_class: MagicMock,
+        mock_crawler_class: MagicMock,
+        tmp_path: Path,
     ) -> None:
         """Test pipeline respects max_videos limit."""
         from src.pipeline import run_pipeline_from_file
@@ -336,29 +639,319 @@ class TestRunPipeline:
             ],
         )
 
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            output_dir = Path(tmp_dir)
-
-            with patch("src.pipeline.tempfile.NamedTemporaryFile") as mock_tmp:
-                mock_tmp_file = MagicMock()
-                mock_tmp_file.__enter__ = MagicMock(return_value=mock_tmp_file)
-                mock_tmp_file.__exit__ = MagicMock(return_value=False)
-                mock_tmp_file.name = "/tmp/fake_video.mp4"
-                mock_tmp.return_value = mock_tmp_file
-
-                with patch("src.pipeline.Path") as mock_path:
-                    mock_video_path = MagicMock()
-                    mock_video_path.exists.return_value = True
-                    mock_path.return_value = mock_video_path
-
-                    run_pipeline_from_file(
-                        video_list=video_list,
-                        api_key="test-key",
-                        output_dir=output_dir,
-                        instagram_username="user",
-                        instagram_password="pass",
-                        max_videos=3,
-                    )
-
-            # Should only process 3 videos
-            assert mock_analyzer.analyze.call_count == 3
+        run_pipeline_from_file(
+            video_list=video_list,
+            api_key="test-key",
+            output_dir=tmp_path,
+            instagram_username="user",
+            instagram_password="pass",
+            max_videos=3,
+        )
+
+        # Should only process 3 videos
+        assert mock_analyzer.analyze.call_count == 3
+
+    @patch("src.pipeline.InstagramCrawler")
+    @patch("src.pipeline.VideoAnalyzer")
+    def test_pipeline_batch_mode(
+        self,
+        mock_analyzer_class: MagicMock,
+        mock_crawler_class: MagicMock,
+        tmp_path: Path,
+    ) -> None:
+        """Test batch mode uploads every video and submits one batch job."""
+        from src.pipeline import run_pipeline_from_file
+
+        mock_crawler = MagicMock()
+        mock_crawler_class.return_value = mock_crawler
+
+        mock_analyzer = MagicMock()
+        mock_analyzer_class.return_value = mock_analyzer
+        mock_analyzer.upload.side_effect = [MagicMock(), Exception("Upload failed")]
+        mock_analyzer.analyze_batch.return_value = [
+            VideoResult(
+                shortcode="BATCH0",
+                url="https://www.instagram.com/p/BATCH0/",
+                is_exercise_video=False,
+                general_insights={"trainer_insights": "Rest", "video_type": "tips"},
+            )
+        ]
+
+        video_list = VideoList(
+            profile="batch_test",
+            videos=[
+                VideoPost(
+                    shortcode=f"BATCH{i}",
+                    url=f"https://www.instagram.com/p/BATCH{i}/",
+                    video_url=f"https://cdn.instagram.com/batch{i}.mp4",
+                )
+                for i in range(2)
+            ],
+        )
+
+        run_pipeline_from_file(
+            video_list=video_list,
+            api_key="test-key",
+            output_dir=tmp_path,
+            instagram_username="user",
+            instagram_password="pass",
+            batch=True,
+        )
+
+        mock_analyzer.analyze.assert_not_called()
+        mock_analyzer.analyze_batch.assert_called_once()
+        assert len(mock_analyzer.analyze_batch.call_args.args[0]) == 1
+
+        state = _load_progress("batch_test", tmp_path)
+        assert state.processed_shortcodes == {"BATCH0"}
+
+    @patch("src.pipeline.InstagramCrawler")
+    @patch("src.pipeline.VideoAnalyzer")
+    def test_pipeline_concurrent_processing(
+        self,
+        mock_analyzer_class: MagicMock,
+        mock_crawler_class: MagicMock,
+        tmp_path: Path,
+    ) -> None:
+        """Test every video is recorded when processed in parallel."""
+        from src.pipeline import run_pipeline_from_file
+
+        mock_crawler_class.return_value = MagicMock()
+        mock_analyzer = MagicMock()
+        mock_analyzer_class.return_value = mock_analyzer
+        mock_analyzer.analyze.side_effect = lambda _video, shortcode: VideoResult(
+            shortcode=shortcode,
+            url=f"https://www.instagram.com/p/{shortcode}/",
+            is_exercise_video=False,
+            general_insights={"trainer_insights": "Rest", "video_type": "tips"},
+        )
+
+        video_list = VideoList(
+            profile="concurrent_test",
+            videos=[
+                VideoPost(
+                    shortcode=f"PAR{i}",
+                    url=f"https://www.instagram.com/p/PAR{i}/",
+                    video_url=f"https://cdn.instagram.com/par{i}.mp4",
+                )
+                for i in range(6)
+            ],
+        )
+
+        run_pipeline_from_file(
+            video_list=video_list,
+            api_key="test-key",
+            output_dir=tmp_path,
+            instagram_username="user",
+            instagram_password="pass",
+            concurrency=3,
+        )
+
+        state = _load_progress("concurrent_test", tmp_path)
+        assert mock_analyzer.analyze.call_count == 6
+        assert sorted(state.processed_shortcodes) == [f"PAR{i}" for i in range(6)]
+
+    @patch("src.pipeline.InstagramCrawler")
+    @patch("src.pipeline.VideoAnalyzer")
+    def test_pipeline_records_out_of_order_results(
+        self,
+        mock_analyzer_class: MagicMock,
+        mock_crawler_class: MagicMock,
+        tmp_path: Path,
+    ) -> None:
+        """Test every result is recorded when videos finish out of order."""
+        from src.pipeline import run_pipeline_from_file
+
+        second_done = threading.Event()
+
+        def analyze(_video: object, shortcode: str) -> VideoResult:
+            # The first video can only finish once the second one has
+            if shortcode == "FIRST":
+                assert second_done.wait(timeout=5)
+            else:
+                second_done.set()
+            return VideoResult(
+                shortcode=shortcode,
+                url=f"https://www.instagram.com/p/{shortcode}/",
+                is_exercise_video=False,
+            )
+
+        mock_crawler_class.return_value = MagicMock()
+        mock_analyzer = MagicMock()
+        mock_analyzer_class.return_value = mock_analyzer
+        mock_analyzer.analyze.side_effect = analyze
+
+        video_list = VideoList(
+            profile="order_test",
+            videos=[
+                VideoPost(
+                    shortcode=shortcode,
+                    url=f"https://www.instagram.com/p/{shortcode}/",
+                    video_url=f"https://cdn.instagram.com/{shortcode}.mp4",
+                )
+                for shortcode in ["FIRST", "SECOND"]
+            ],
+        )
+
+        run_pipeline_from_file(
+            video_list=video_list,
+            api_key="test-key",
+            output_dir=tmp_path,
+            instagram_username="user",
+            instagram_password="pass",
+            concurrency=2,
+        )
+
+        state = _load_progress("order_test", tmp_path)
+        results = load_results(Path(state.results_file))
+        assert {r.shortcode for r in results} == {"FIRST", "SECOND"}
+        assert state.processed_shortcodes == {"FIRST", "SECOND"}
+
+    @patch("src.pipeline.InstagramCrawler")
+    @patch("src.pipeline.VideoAnalyzer")
+    def test_pipeline_download_failure_is_retried_later(
+        self,
+        mock_analyzer_class: MagicMock,
+        mock_crawler_class: MagicMock,
+        tmp_path: Path,
+    ) -> None:
+        """Test a failed prefetch download doesn't stop the other videos."""
+        from src.pipeline import run_pipeline_from_file
+
+        def download(video_url: str, output: io.BytesIO) -> io.BytesIO:
+            if "bad" in video_url:
+                raise ConnectionError("CDN unavailable")
+            output.write(b"video")
+            output.seek(0)
+            return output
+
+        mock_crawler = MagicMock()
+        mock_crawler.download_video.side_effect = download
+        mock_crawler_class.return_value = mock_crawler
+        mock_analyzer = MagicMock()
+        mock_analyzer_class.return_value = mock_analyzer
+        mock_analyzer.analyze.side_effect = lambda video, shortcode: VideoResult(
+            shortcode=shortcode,
+            url=f"https://www.instagram.com/p/{shortcode}/",
+            is_exercise_video=False,
+            general_insights={
+                "trainer_insights": video.read().decode(),
+                "video_type": "tips",
+            },
+        )
+
+        video_list = VideoList(
+            profile="prefetch_test",
+            videos=[
+                VideoPost(
+                    shortcode=name.upper(),
+                    url=f"https://www.instagram.com/p/{name.upper()}/",
+                    video_url=f"https://cdn.instagram.com/{name}.mp4",
+                )
+                for name in ["good1", "bad", "good2", "good3"]
+            ],
+        )
+
+        run_pipeline_from_file(
+            video_list=video_list,
+            api_key="test-key",
+            output_dir=tmp_path,
+            instagram_username="user",
+            instagram_password="pass",
+        )
+
+        state = _load_progress("prefetch_test", tmp_path)
+        assert mock_analyzer.analyze.call_count == 3
+        assert sorted(state.processed_shortcodes) == ["GOOD1", "GOOD2", "GOOD3"]
+
+    @patch("src.pipeline.InstagramCrawler")
+    @patch("src.pipeline.VideoAnalyzer")
+    def test_pipeline_downloads_run_concurrently(
+        self,
+        mock_analyzer_class: MagicMock,
+        mock_crawler_class: MagicMock,
+        tmp_path: Path,
+    ) -> None:
+        """Test several downloads overlap even with a single analysis worker."""
+        from src.pipeline import DOWNLOAD_WORKERS, run_pipeline_from_file
+
+        # Each download waits until all download workers are busy at once
+        barrier = threading.Barrier(DOWNLOAD_WORKERS, timeout=5)
+
+        def download(video_url: str, output: io.BytesIO) -> io.BytesIO:
+            if video_url.endswith(tuple(f"{i}.mp4" for i in range(DOWNLOAD_WORKERS))):
+                barrier.wait()
+            return output
+
+        mock_crawler = MagicMock()
+        mock_crawler.download_video.side_effect = download
+        mock_crawler_class.return_value = mock_crawler
+        mock_analyzer = MagicMock()
+        mock_analyzer_class.return_value = mock_analyzer
+        mock_analyzer.analyze.side_effect = lambda _video, shortcode: VideoResult(
+            shortcode=shortcode,
+            url=f"https://www.instagram.com/p/{shortcode}/",
+            is_exercise_video=False,
+            general_insights={"trainer_insights": "Rest", "video_type": "tips"},
+        )
+
+        video_list = VideoList(
+            profile="download_test",
+            videos=[
+                VideoPost(
+                    shortcode=f"DL{i}",
+                    url=f"https://www.instagram.com/p/DL{i}/",
+                    video_url=f"https://cdn.instagram.com/dl{i}.mp4",
+                )
+                for i in range(DOWNLOAD_WORKERS + 2)
+            ],
+        )
+
+        run_pipeline_from_file(
+            video_list=video_list,
+            api_key="test-key",
+            output_dir=tmp_path,
+            instagram_username="user",
+            instagram_password="pass",
+            concurrency=1,
+        )
+
+        state = _load_progress("download_test", tmp_path)
+        assert len(state.processed_shortcodes) == DOWNLOAD_WORKERS + 2
+
+    def test_interrupt_does_not_wait_for_running_analyses(self) -> None:
+        """Test closing the stages returns while an analysis is still running."""
+        slow_started = threading.Event()
+        release = threading.Event()
+
+        def analyze(_video: object, shortcode: str) -> VideoResult:
+            if shortcode == "SLOW":
+                slow_started.set()
+                release.wait(timeout=5)
+            return VideoResult(
+                shortcode=shortcode,
+                url=f"https://www.instagram.com/p/{shortcode}/",
+                is_exercise_video=False,
+            )
+
+        analyzer = MagicMock()
+        analyzer.analyze.side_effect = analyze
+        posts = [
+            VideoPost(
+                shortcode=shortcode,
+                url=f"https://www.instagram.com/p/{shortcode}/",
+                video_url=f"https://cdn.instagram.com/{shortcode}.mp4",
+            )
+            for shortcode in ["FAST", "SLOW"]
+        ]
+
+        groups = _process_videos(posts, MagicMock(), analyzer, concurrency=2)
+        assert [post.shortcode for post, _ in next(groups)] == ["FAST"]
+        assert slow_started.wait(timeout=5)
+
+        started = time.monotonic()
+        groups.close()
+        closed_after = time.monotonic() - started
+        release.set()
+
+        assert closed_after < 1
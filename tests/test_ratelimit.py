@@ -0,0 +1,68 @@
+"""Tests for the token bucket rate limiter."""
+
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.ratelimit import TokenBucket
+
+
+class TestTokenBucket:
+    """Tests for TokenBucket."""
+
+    def test_rejects_invalid_rate(self) -> None:
+        """Test that non-positive rates and bursts are rejected."""
+        with pytest.raises(ValueError):
+            TokenBucket(0)
+        with pytest.raises(ValueError):
+            TokenBucket(60, burst=0)
+
+    @patch("src.ratelimit.time.sleep")
+    @patch("src.ratelimit.time.monotonic")
+    def test_burst_then_paced(
+        self, mock_monotonic: MagicMock, mock_sleep: MagicMock
+    ) -> None:
+        """Test that the burst is free and later calls wait for refills."""
+        mock_monotonic.return_value = 100.0
+        bucket = TokenBucket(requests_per_minute=30, burst=2)
+
+        bucket.acquire()
+        bucket.acquire()
+        mock_sleep.assert_not_called()
+
+        # 30 rpm refills one token every 2 seconds
+        bucket.acquire()
+        mock_sleep.assert_called_once_with(pytest.approx(2.0))
+
+    @patch("src.ratelimit.time.sleep")
+    @patch("src.ratelimit.time.monotonic")
+    def test_refills_while_idle(
+        self, mock_monotonic: MagicMock, mock_sleep: MagicMock
+    ) -> None:
+        """Test that idle time refills tokens up to the burst size."""
+        mock_monotonic.return_value = 0.0
+        bucket = TokenBucket(requests_per_minute=60)
+        bucket.acquire()
+
+        mock_monotonic.return_value = 10.0
+        bucket.acquire()
+        mock_sleep.assert_not_called()
+
+    @patch("src.ratelimit.time.sleep")
+    @patch("src.ratelimit.time.monotonic")
+    def test_concurrent_callers_are_spaced(
+        self, mock_monotonic: MagicMock, mock_sleep: MagicMock
+    ) -> None:
+        """Test that waiting threads reserve successive slots."""
+        mock_monotonic.return_value = 0.0
+        bucket = TokenBucket(requests_per_minute=60)
+
+        threads = [threading.Thread(target=bucket.acquire) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        waits = sorted(call.args[0] for call in mock_sleep.call_args_list)
+        assert waits == pytest.approx([1.0, 2.0, 3.0])